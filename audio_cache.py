@@ -0,0 +1,82 @@
+"""Cache of decoded 16 kHz mono PCM as memory-mapped ``.npy`` files.
+
+Decoding an hour-long video with ffmpeg takes seconds to tens of seconds.
+Warm runs memory-map the cached float32 samples instead. Entries are keyed
+by source path, size and mtime, and the oldest entries are evicted once
+the cache grows past its size cap.
+"""
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from stage_cache import DEFAULT_CACHE_DIR
+
+
+class AudioCache:
+    def __init__(self, max_size_mb, root=None):
+        self.max_size_mb = max_size_mb
+        self.root = Path(root) if root else Path(DEFAULT_CACHE_DIR) / "audio"
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(path):
+        stat = os.stat(path)
+        source = f"{os.path.realpath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return self.root / f"{key}.npy"
+
+    def load(self, path, decoder):
+        """Return the decoded audio of ``path``, calling ``decoder(path)`` on a miss"""
+        npy_path = self.path(self.key(path))
+        try:
+            # Copy-on-write keeps the array writable for torch.from_numpy
+            # while the pages stay shared with the page cache
+            audio = np.load(npy_path, mmap_mode="c")
+            # Mark as recently used for eviction
+            os.utime(npy_path)
+            return audio
+        except (FileNotFoundError, ValueError, OSError):
+            pass
+
+        audio = decoder(path)
+        self.store(npy_path, audio)
+        return audio
+
+    def store(self, npy_path, audio):
+        npy_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = npy_path.with_name(f"{npy_path.stem}.{os.getpid()}.{threading.get_ident()}.tmp.npy")
+        np.save(tmp_path, np.asarray(audio, dtype=np.float32))
+        os.replace(tmp_path, npy_path)
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits its cap"""
+        with self._lock:
+            entries = []
+            for npy_path in self.root.glob("*.npy"):
+                if npy_path.name.endswith(".tmp.npy"):
+                    continue
+                try:
+                    stat = npy_path.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, npy_path))
+
+            total = sum(size for _, size, _ in entries)
+            limit = self.max_size_mb * 1024 * 1024
+            for _, size, npy_path in sorted(entries):
+                if total <= limit:
+                    break
+                try:
+                    npy_path.unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    # Still memory-mapped by a reader on Windows
+                    continue
+                total -= size
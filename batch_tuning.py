@@ -0,0 +1,109 @@
+"""Batch size auto-tuning for the transcribe call.
+
+The best batch size depends on the model, device and compute type. The
+tuner probes increasing batch sizes on real audio, stops at the first
+out-of-memory error or when throughput stops improving, and records the
+result in a local profile so later runs start at the tuned value.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from stage_cache import DEFAULT_CACHE_DIR
+
+SAMPLE_RATE = 16000
+# whisperx feeds the model 30 second chunks, one per batch item
+CHUNK_SECONDS = 30
+
+GPU_CANDIDATES = (4, 8, 16, 32, 64)
+CPU_CANDIDATES = (1, 2, 4, 8, 16)
+
+# Stop probing once a larger batch is less than this much faster
+MIN_SPEEDUP = 1.05
+
+
+def is_out_of_memory(error):
+    if isinstance(error, MemoryError):
+        return True
+    message = str(error).lower()
+    return "out of memory" in message or "cuda_error_out_of_memory" in message
+
+
+class BatchProfile:
+    """Tuned batch sizes keyed by (model, device, compute_type), stored as JSON"""
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else Path(DEFAULT_CACHE_DIR) / "batch_profile.json"
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model_name, device, compute_type):
+        return f"{model_name}|{device}|{compute_type}"
+
+    def _read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, model_name, device, compute_type):
+        with self._lock:
+            entry = self._read().get(self.key(model_name, device, compute_type))
+        return entry["batch_size"] if entry else None
+
+    def set(self, model_name, device, compute_type, batch_size):
+        with self._lock:
+            profile = self._read()
+            profile[self.key(model_name, device, compute_type)] = {
+                "batch_size": batch_size,
+                "updated": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(profile, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def probe_audio(audio, batch_size):
+    """Audio long enough to fill ``batch_size`` chunks, repeating ``audio`` if needed"""
+    needed = batch_size * CHUNK_SECONDS * SAMPLE_RATE
+    if len(audio) >= needed:
+        return audio[:needed]
+    repeats = needed // max(1, len(audio)) + 1
+    return np.tile(audio, repeats)[:needed]
+
+
+def tune_batch_size(model, audio, language, device, log=print, empty_cache=None):
+    """Return the batch size with the best throughput on ``audio``"""
+    candidates = GPU_CANDIDATES if device == "cuda" else CPU_CANDIDATES
+    best_size, best_speed = candidates[0], 0.0
+
+    for batch_size in candidates:
+        sample = probe_audio(audio, batch_size)
+        try:
+            start = time.perf_counter()
+            model.transcribe(sample, batch_size=batch_size, language=language)
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            if not is_out_of_memory(e):
+                raise
+            log(f"Batch size {batch_size}: out of memory")
+            if empty_cache:
+                empty_cache()
+            break
+
+        speed = len(sample) / SAMPLE_RATE / max(elapsed, 1e-6)
+        log(f"Batch size {batch_size}: {speed:.1f}x real time")
+        if speed < best_speed * MIN_SPEEDUP:
+            if speed > best_speed:
+                best_size, best_speed = batch_size, speed
+            break
+        best_size, best_speed = batch_size, speed
+
+    return best_size
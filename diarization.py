@@ -0,0 +1,44 @@
+"""Speaker diarization with pyannote, through whisperx.
+
+``diarize`` returns plain speaker turns plus one embedding per speaker, so
+the result can be cached as JSON and merged into any transcript of the
+same audio with ``assign_speakers`` without running the model again.
+"""
+SAMPLE_RATE = 16000
+
+DIARIZE_MODEL = "pyannote/speaker-diarization-3.1"
+# Segmentation and speaker embedding models together
+DIARIZE_MB = 300
+
+
+def load_diarize_model(device, hf_token=None):
+    # pyannote is slow to import, only pay for it when diarization is used
+    from whisperx.diarize import DiarizationPipeline
+    return DiarizationPipeline(DIARIZE_MODEL, use_auth_token=hf_token, device=device)
+
+
+def diarize(model, audio, min_speakers=None, max_speakers=None):
+    """Speaker turns and per-speaker embeddings of 16 kHz ``audio``"""
+    import torch
+
+    audio_data = {"waveform": torch.from_numpy(audio[None, :]), "sample_rate": SAMPLE_RATE}
+    # Call the pyannote pipeline directly, whisperx's wrapper drops the embeddings
+    annotation, embeddings = model.model(audio_data, min_speakers=min_speakers, max_speakers=max_speakers,
+                                         return_embeddings=True)
+    turns = [
+        {"start": float(turn.start), "end": float(turn.end), "speaker": speaker}
+        for turn, _, speaker in annotation.itertracks(yield_label=True)
+    ]
+    # Embeddings come in the order of annotation.labels()
+    speakers = {label: embedding.tolist() for label, embedding in zip(annotation.labels(), embeddings)}
+    return {"turns": turns, "embeddings": speakers}
+
+
+def assign_speakers(result, diarization):
+    """Label the segments and words of ``result`` with the speaker talking most during them"""
+    if not diarization["turns"]:
+        return result
+    import pandas as pd
+    from whisperx.diarize import assign_word_speakers
+
+    return assign_word_speakers(pd.DataFrame(diarization["turns"]), result)
@@ -0,0 +1,908 @@
+"""Headless WhisperX transcription engine.
+
+The load/transcribe/align/write pipeline used by the GUI, without any Tk
+dependency, so it can run on machines without a display server.
+
+Usage:
+    python -m engine [options] FILE_OR_GLOB [FILE_OR_GLOB ...]
+"""
+import argparse
+import datetime
+import glob
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+import torch
+import whisperx
+
+from audio_cache import AudioCache
+from batch_tuning import BatchProfile, is_out_of_memory, tune_batch_size
+from diarization import DIARIZE_MB, DIARIZE_MODEL, assign_speakers, diarize, load_diarize_model
+from job_store import JobStore, default_path
+from language_detection import LanguageDetector
+from model_cache import (align_models, diarize_models, estimate_align_mb, estimate_whisper_mb, memory_limit_from_env,
+                         whisper_models)
+from pipeline import StagedPipeline, run_stages
+from scheduler import schedule
+from stage_cache import DEFAULT_CACHE_DIR, StageCache, file_digest
+from streaming import SAMPLE_RATE, stream_segments
+from subtitles import DEFAULT_FORMATS, IncrementalWriter, find_checkpoint, format_timestamp, parse_formats, write_outputs
+from telemetry import JsonlSink, LogSink, PrometheusSink, Telemetry
+from word_timings import sidecar_path, words_from_segments, write_word_timings
+from worker_pool import default_worker_count, run_pool
+
+
+def default_device():
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def default_compute_type(device):
+    # float16 is not supported by ctranslate2 on CPU
+    return "float16" if device == "cuda" else "int8"
+
+
+def create_output_directory(input_file, output_root="transcripts"):
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M")
+    base_name = Path(input_file).stem
+    output_dir = Path(output_root) / f"{base_name}_{timestamp}"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    return output_dir
+
+
+def unload_models():
+    """Release every cached model and return the memory to the device"""
+    whisper_models.unload()
+    align_models.unload()
+    diarize_models.unload()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def expand_inputs(patterns):
+    """Expand a list of file paths and glob patterns into unique file paths"""
+    files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+        for match in matches:
+            if os.path.isfile(match) and match not in files:
+                files.append(match)
+    return files
+
+
+class TranscriptionEngine:
+    """Runs the WhisperX pipeline over a list of files.
+
+    Progress messages are passed to ``log``, which defaults to ``print``.
+    """
+
+    def __init__(self, model_name="medium", language="en", compute_type=None,
+                 word_timestamps=False, align=None, diarize=False, min_speakers=None, max_speakers=None,
+                 hf_token=None, diarize_workers=1, batch_size=16, device=None,
+                 output_root="transcripts", pipelined=True, queue_size=2,
+                 cpu_threads=4, workers=1, worker_memory_mb=None, cache_dir=DEFAULT_CACHE_DIR,
+                 audio_cache_mb=None, streaming=False, window_seconds=600, overlap_seconds=30,
+                 resume=True, output_formats=DEFAULT_FORMATS, reorder=True, job_store=None, force=False,
+                 telemetry=None, log=print):
+        self.model_name = model_name
+        # language="auto" detects the language of every file from its first
+        # 30 seconds and aligns it with the matching alignment model
+        self.language = language
+        self.language_detector = LanguageDetector(cache_dir) if language == "auto" else None
+        self.device = device or default_device()
+        self.compute_type = compute_type or default_compute_type(self.device)
+        self.word_timestamps = word_timestamps
+        # Alignment only adds word timings, by default it runs only when word
+        # timestamps are on so segment-level runs never load an aligner
+        self.align_enabled = word_timestamps if align is None else align
+        # diarize=True labels segments and words with speakers. Diarization
+        # runs in diarize_workers threads of its own while the file is
+        # transcribed and aligned, and is merged in afterwards
+        if diarize and streaming:
+            raise ValueError("diarization needs the whole recording and cannot be combined with streaming")
+        self.diarize = diarize
+        self.min_speakers = min_speakers
+        self.max_speakers = max_speakers
+        self.hf_token = hf_token or os.environ.get("HF_TOKEN")
+        self.diarize_workers = diarize_workers
+        self.diarize_pool = None
+        # batch_size="auto" uses the tuned value from the batch profile,
+        # probing for one on the first file if there is none yet
+        self.batch_size = batch_size
+        self.batch_profile = BatchProfile(Path(cache_dir or DEFAULT_CACHE_DIR) / "batch_profile.json")
+        self.active_batch_size = None if batch_size == "auto" else batch_size
+        # The Whisper model keeps per-call state (its tokenizer) and the batch
+        # size is tuned per engine, so threads sharing an engine take turns
+        # transcribing and only overlap the other stages
+        self.transcribe_lock = threading.Lock()
+        self.output_root = output_root
+        # Any of subtitles.FORMATS, all written in a single pass
+        self.output_formats = tuple(output_formats)
+        # With pipelined=True each stage runs in its own thread and at most
+        # queue_size jobs wait between two stages
+        self.pipelined = pipelined
+        self.queue_size = queue_size
+        # On CPU, workers > 1 runs files in separate processes, each with its
+        # own model and cpu_threads intra-op threads
+        self.cpu_threads = cpu_threads
+        self.workers = workers
+        self.worker_memory_mb = worker_memory_mb
+        # Transcription and alignment results are reused from cache_dir,
+        # cache_dir=None disables the cache
+        self.cache_dir = cache_dir
+        self.stage_cache = StageCache(cache_dir) if cache_dir else None
+        # Decoded audio is memory-mapped from disk when audio_cache_mb is set
+        self.audio_cache_mb = audio_cache_mb
+        self.audio_cache = None
+        if cache_dir and audio_cache_mb:
+            self.audio_cache = AudioCache(audio_cache_mb, Path(cache_dir) / "audio")
+        # streaming=True decodes and processes the audio in overlapping
+        # windows so memory does not grow with the length of the recording
+        self.streaming = streaming
+        self.window_seconds = window_seconds
+        self.overlap_seconds = overlap_seconds
+        # Streaming output is written incrementally and an interrupted file
+        # resumes from its last checkpoint when resume=True
+        self.resume = resume
+        # reorder=True runs the batch grouped by language, longest files
+        # first, see scheduler.py
+        self.reorder = reorder
+        # With a job_store every file is recorded with its status and outputs,
+        # and files already transcribed with the same settings are skipped
+        # unless force=True
+        self.job_store = job_store
+        self.force = force
+        self.job_ids = {}
+        # Structured per-file/per-stage events, see telemetry.py
+        self.telemetry = telemetry or Telemetry()
+        self.log = log
+        self.model = None
+
+    def whisper_key(self):
+        return (self.model_name, self.device, self.compute_type)
+
+    def load_model(self):
+        if self.model is None:
+            key = self.whisper_key()
+            if key in whisper_models:
+                self.log("Using already loaded WhisperX model")
+            elif whisper_models.loading(key):
+                # Pre-loaded in the background, wait for that load to finish
+                self.log("Waiting for WhisperX model to finish loading...")
+            else:
+                self.log("Loading WhisperX model...")
+            # The model stays resident in the process-wide cache between runs
+            self.model = whisper_models.get(
+                key,
+                lambda: self.timed_load("whisper", self.model_name, lambda: whisperx.load_model(
+                    self.model_name,
+                    self.device,
+                    compute_type=self.compute_type,
+                    threads=self.cpu_threads
+                )),
+                size_mb=estimate_whisper_mb(self.model_name, self.compute_type)
+            )
+        return self.model
+
+    def prewarm(self, is_current=None):
+        """Load the models the first file will need before it is queued.
+
+        The alignment model is loaded too when alignment is on, unless the
+        language is "auto".
+        Loading stops between models once ``is_current()`` returns False.
+        Returns ``(cache, key)`` for each model this call loaded.
+        """
+        needed = [(whisper_models, self.whisper_key(), self.load_model)]
+        if self.align_enabled and self.language != "auto":
+            needed.append((align_models, (self.language, self.device),
+                           lambda: self.load_align_model(self.language)))
+
+        loaded = []
+        for cache, key, load in needed:
+            if is_current and not is_current():
+                break
+            if key not in cache:
+                loaded.append((cache, key))
+            load()
+        return loaded
+
+    def timed_load(self, kind, name, loader):
+        start = time.perf_counter()
+        model = loader()
+        self.telemetry.emit("model_load", kind=kind, name=name, device=self.device,
+                            compute_type=self.compute_type, duration=round(time.perf_counter() - start, 4))
+        return model
+
+    def prepare(self, job):
+        input_file = job["input_file"]
+        self.log(f"\nStarting transcription of: {input_file}")
+        job["started"] = time.time()
+        self.telemetry.emit("file_start", file=str(input_file))
+        if input_file in self.job_ids:
+            self.job_store.start(self.job_ids[input_file])
+        job["language"] = self.detect_language(input_file)
+
+        # Use the output directory given by the caller, create one, or reuse
+        # the one of an interrupted streaming run
+        output_dir = job.get("output_dir")
+        if output_dir:
+            output_dir = Path(output_dir)
+            output_dir.mkdir(parents=True, exist_ok=True)
+            self.log(f"Output directory: {output_dir}")
+        elif self.streaming and self.resume:
+            output_dir = find_checkpoint(self.output_root, input_file,
+                                         self.checkpoint_key(input_file, job["language"]))
+            if output_dir:
+                self.log(f"Resuming interrupted transcription in: {output_dir}")
+        if not output_dir:
+            output_dir = create_output_directory(input_file, self.output_root)
+            self.log(f"Output directory: {output_dir}")
+        job["output_dir"] = output_dir
+
+        if self.stage_cache:
+            self.lookup_cached_results(job)
+        return job
+
+    def detect_language(self, input_file):
+        if not self.language_detector:
+            return self.language
+        language = self.language_detector.detect(input_file, self.load_model(), self.model_name)
+        self.log(f"Detected language of {os.path.basename(input_file)}: {language}")
+        return language
+
+    def decode(self, job):
+        job = self.prepare(job)
+        if self.result_complete(job):
+            # Every enabled stage is cached, the audio is not needed at all
+            return job
+
+        input_file = job["input_file"]
+        # Load audio
+        if self.audio_cache:
+            job["audio"] = self.audio_cache.load(input_file, whisperx.load_audio)
+        else:
+            job["audio"] = whisperx.load_audio(input_file)
+        job["audio_seconds"] = len(job["audio"]) / SAMPLE_RATE
+
+        if self.diarize and "diarization" not in job:
+            # Runs next to the transcribe and align stages on the same audio
+            job["diarization"] = self.start_diarization(job["audio"], job.get("diarize_key"))
+        return job
+
+    def result_complete(self, job):
+        """True once the job has a result from every enabled stage"""
+        complete = job.get("aligned") or ("result" in job and not self.align_enabled)
+        return complete and (not self.diarize or "diarization" in job)
+
+    def lookup_cached_results(self, job):
+        """Fill ``job["result"]`` from the stage cache.
+
+        Returns True when the aligned result was found, so neither the
+        audio nor any model is needed for this file.
+        """
+        name = os.path.basename(job["input_file"])
+        audio_hash = file_digest(job["input_file"])
+        if self.diarize:
+            # Speaker turns only depend on the audio, not on the ASR settings
+            job["diarize_key"] = StageCache.key("diarize", audio_hash, DIARIZE_MODEL,
+                                                self.min_speakers, self.max_speakers)
+            diarization = self.stage_cache.load("diarize", job["diarize_key"])
+            if diarization is not None:
+                self.log(f"Using cached speaker diarization for {name}")
+                job["diarization"] = diarization
+        # Streamed results differ slightly at window edges, keep them apart
+        variant = ("stream", self.window_seconds, self.overlap_seconds) if self.streaming else ()
+        # The batch size is left out: it changes throughput, not the transcript
+        job["asr_key"] = StageCache.key("asr", audio_hash, self.model_name, job["language"],
+                                        self.compute_type, *variant)
+        job["align_key"] = StageCache.key("align", job["asr_key"], job["language"])
+
+        # Segment-only runs use the plain transcription even if an earlier
+        # run aligned this file, so their output does not depend on history
+        aligned = self.stage_cache.load("align", job["align_key"]) if self.align_enabled else None
+        if aligned is not None:
+            self.log(f"Using cached transcription and alignment for {name}")
+            job["result"] = aligned
+            job["aligned"] = True
+            return True
+
+        transcribed = self.stage_cache.load("asr", job["asr_key"])
+        if transcribed is not None:
+            self.log(f"Using cached transcription for {name}")
+            job["result"] = transcribed
+        return False
+
+    def transcribe(self, job):
+        if "result" in job:
+            job["stage_metrics"] = {"cached": True}
+            return job
+
+        # WhisperX handles word timestamps differently
+        # First transcribe with Whisper (without word timestamps parameter)
+        name = os.path.basename(job["input_file"])
+        self.log(f"Transcribing {name}... (Word timestamps: {'enabled' if self.word_timestamps else 'disabled'})")
+        start = time.perf_counter()
+        self.load_model()
+        loaded = time.perf_counter()
+        job["result"] = self.transcribe_audio(job["audio"], job["language"])
+        job["stage_metrics"] = {
+            "model_load_seconds": round(loaded - start, 4),
+            "inference_seconds": round(time.perf_counter() - loaded, 4),
+        }
+        if self.stage_cache:
+            self.stage_cache.store("asr", job["asr_key"], job["result"])
+        return job
+
+    def resolve_batch_size(self, audio, language):
+        if self.active_batch_size is None:
+            tuned = self.batch_profile.get(self.model_name, self.device, self.compute_type)
+            if tuned:
+                self.log(f"Using tuned batch size: {tuned}")
+            else:
+                self.log("Tuning batch size...")
+                tuned = tune_batch_size(self.load_model(), audio, language, self.device,
+                                        log=self.log, empty_cache=self.empty_cache)
+                self.batch_profile.set(self.model_name, self.device, self.compute_type, tuned)
+                self.log(f"Tuned batch size: {tuned}")
+            self.active_batch_size = tuned
+        return self.active_batch_size
+
+    def transcribe_audio(self, audio, language=None):
+        """Run the Whisper model on ``audio``, halving the batch size on out-of-memory errors"""
+        language = language or self.language
+        model = self.load_model()
+        with self.transcribe_lock:
+            batch_size = self.resolve_batch_size(audio, language)
+            while True:
+                try:
+                    return model.transcribe(audio, batch_size=batch_size, language=language)
+                except Exception as e:
+                    if not is_out_of_memory(e) or batch_size == 1:
+                        raise
+                self.empty_cache()
+                batch_size = max(1, batch_size // 2)
+                self.log(f"Out of memory, retrying with batch size {batch_size}")
+                self.active_batch_size = batch_size
+                if self.batch_size == "auto":
+                    self.batch_profile.set(self.model_name, self.device, self.compute_type, batch_size)
+
+    def load_align_model(self, language):
+        # Aligners are cached per language so a batch loads each one once
+        return align_models.get(
+            (language, self.device),
+            lambda: self.timed_load("align", language, lambda: whisperx.load_align_model(
+                language_code=language,
+                device=self.device
+            )),
+            size_mb=estimate_align_mb(language)
+        )
+
+    def align(self, job):
+        if job.get("aligned"):
+            job["stage_metrics"] = {"cached": True}
+            return job
+
+        # In WhisperX, the align function is where word-level timestamps are generated
+        self.log(f"Aligning transcript of {os.path.basename(job['input_file'])}...")
+        start = time.perf_counter()
+        model_a, metadata = self.load_align_model(job["language"])
+        loaded = time.perf_counter()
+        # WhisperX align function doesn't have a return_word_timestamps parameter
+        # It always returns word timestamps when available
+        job["result"] = whisperx.align(
+            job["result"]["segments"],
+            model_a,
+            metadata,
+            job["audio"],
+            self.device,
+            return_char_alignments=False
+        )
+        job["stage_metrics"] = {
+            "model_load_seconds": round(loaded - start, 4),
+            "inference_seconds": round(time.perf_counter() - loaded, 4),
+        }
+        job["aligned"] = True
+        if self.stage_cache:
+            self.stage_cache.store("align", job["align_key"], job["result"])
+        return job
+
+    def load_diarize_model(self):
+        return diarize_models.get(
+            (DIARIZE_MODEL, self.device),
+            lambda: self.timed_load("diarize", DIARIZE_MODEL, lambda: load_diarize_model(self.device, self.hf_token)),
+            size_mb=DIARIZE_MB
+        )
+
+    def start_diarization(self, audio, cache_key=None):
+        """Diarize ``audio`` in the diarization pool, returns a Future"""
+        if self.diarize_pool is None:
+            self.diarize_pool = ThreadPoolExecutor(self.diarize_workers, thread_name_prefix="diarize")
+
+        def run():
+            diarization = diarize(self.load_diarize_model(), audio, self.min_speakers, self.max_speakers)
+            if self.stage_cache and cache_key:
+                self.stage_cache.store("diarize", cache_key, diarization)
+            return diarization
+
+        return self.diarize_pool.submit(run)
+
+    def assign_speakers(self, job):
+        diarization = job.pop("diarization")
+        start = time.perf_counter()
+        if isinstance(diarization, Future):
+            self.log(f"Waiting for speaker diarization of {os.path.basename(job['input_file'])}...")
+            diarization = diarization.result()
+        waited = time.perf_counter() - start
+        job["result"] = assign_speakers(job["result"], diarization)
+        job["stage_metrics"] = {
+            "wait_seconds": round(waited, 4),
+            "speakers": len(diarization["embeddings"]),
+        }
+        return job
+
+    def checkpoint_key(self, input_file, language):
+        """Identifies the source file and every setting that changes streamed output"""
+        stat = os.stat(input_file)
+        return StageCache.key("checkpoint", os.path.realpath(input_file), stat.st_size, stat.st_mtime_ns,
+                              self.model_name, language, self.compute_type,
+                              self.window_seconds, self.overlap_seconds, self.word_timestamps,
+                              self.align_enabled, self.output_formats)
+
+    def stream(self, job):
+        if self.result_complete(job):
+            return job
+
+        input_file = job["input_file"]
+        name = os.path.basename(input_file)
+        language = job["language"]
+        writer = IncrementalWriter(job["output_dir"], Path(input_file).stem, self.checkpoint_key(input_file, language),
+                                   self.output_formats, self.word_timestamps, language,
+                                   keep_words=self.align_enabled)
+        resumed = writer.open(resume=self.resume)
+        if resumed:
+            self.log(f"Resuming {name} from {format_timestamp(writer.offset)} ({writer.index} segments already written)")
+        else:
+            self.log(f"Streaming {name} in {self.window_seconds:g}s windows...")
+
+        # Segments are written as soon as their window is done, and the
+        # checkpoint moves forward after every window
+        segments = []
+        try:
+            for segment in stream_segments(self, input_file, align=self.align_enabled, language=language,
+                                           start_seconds=writer.offset,
+                                           emitted_until=writer.emitted_until,
+                                           on_window_done=writer.checkpoint):
+                writer.write(segment)
+                segments.append(segment)
+        except BaseException:
+            # Keep the checkpoint so the next run can resume
+            writer.close()
+            raise
+        word_segments = writer.finish()
+
+        if self.align_enabled:
+            # The writer kept the words from before a resume too
+            self.write_word_sidecar(job["output_dir"], Path(input_file).stem, word_segments)
+
+        job["result"] = {"segments": segments, "language": language}
+        job["aligned"] = self.align_enabled
+        job["written"] = True
+        # A resumed run only holds the segments after the checkpoint
+        if self.stage_cache and not resumed:
+            if self.align_enabled:
+                self.stage_cache.store("align", job["align_key"], job["result"])
+            else:
+                self.stage_cache.store("asr", job["asr_key"], job["result"])
+        return job
+
+    def write(self, job):
+        if job.get("written"):
+            return job
+
+        output_dir = job["output_dir"]
+        stem = Path(job["input_file"]).stem
+        # The decoded audio is no longer needed by the time the files are written
+        job.pop("audio", None)
+        write_outputs(output_dir, stem, job["result"]["segments"], self.output_formats,
+                      self.word_timestamps, job["result"].get("language", job["language"]))
+        if self.align_enabled:
+            self.write_word_sidecar(output_dir, stem, job["result"]["segments"])
+        return job
+
+    def write_word_sidecar(self, output_dir, stem, segments):
+        # Real per-word times for the viewers in tools/, see word_timings.py
+        write_word_timings(sidecar_path(output_dir, stem), words_from_segments(segments))
+
+    def stages(self):
+        if self.streaming:
+            stages = [
+                ("prepare", self.prepare),
+                ("stream", self.stream),
+                ("write", self.write),
+            ]
+        else:
+            stages = [
+                ("decode", self.decode),
+                ("transcribe", self.transcribe),
+                ("align", self.align),
+                ("diarize", self.assign_speakers),
+                ("write", self.write),
+            ]
+            # Disabled stages are left out of the graph altogether
+            enabled = {"align": self.align_enabled, "diarize": self.diarize}
+            stages = [(name, func) for name, func in stages if enabled.get(name, True)]
+        return [(name, self.instrumented(name, func)) for name, func in stages]
+
+    def instrumented(self, name, func):
+        """Wrap a stage so it emits a ``stage`` telemetry event"""
+        def run_stage(job):
+            with self.telemetry.stage(name, job["input_file"]) as fields:
+                job = func(job)
+                fields.update(job.pop("stage_metrics", {}))
+                if job.get("audio_seconds"):
+                    fields["audio_seconds"] = round(job["audio_seconds"], 3)
+                if "result" in job:
+                    fields["segments"] = len(job["result"]["segments"])
+            return job
+        return run_stage
+
+    def process_file(self, input_file, output_dir=None):
+        """Run a single file through every stage, raising on failure.
+
+        Outputs go to ``output_dir`` when given, otherwise to a new
+        timestamped directory under ``output_root``.
+        """
+        job = {"input_file": input_file}
+        if output_dir:
+            job["output_dir"] = output_dir
+        job = run_stages(job, self.stages())
+        self.emit_file_end(job)
+        if "error" in job:
+            raise job["error"]
+        return job["output_dir"]
+
+    def run(self, files, on_file_done=None):
+        """Transcribe every file in ``files``.
+
+        A failure on one file is logged and does not stop the batch.
+        ``on_file_done(input_file, output_dir)`` is called after each
+        successful file, and with the earlier output directory for files
+        the job store already has done with the same settings. Returns a
+        list of ``(input_file, error)`` tuples for the files that failed.
+        """
+        if self.job_store:
+            files, done = self.submit_jobs(files)
+            if on_file_done:
+                for input_file, output_dir in done:
+                    on_file_done(input_file, Path(output_dir))
+        pooled = self.workers > 1 and self.device == "cpu" and len(files) > 1
+        if self.reorder and len(files) > 1:
+            files = self.schedule(files, by_language=not pooled)
+
+        if pooled:
+            def file_done(input_file, output_dir):
+                self.record_result(input_file, output_dir=output_dir)
+                if on_file_done:
+                    on_file_done(input_file, output_dir)
+
+            failures = run_pool(
+                files,
+                self.worker_settings(),
+                workers=self.workers,
+                threads_per_worker=self.cpu_threads,
+                memory_limit_mb=self.worker_memory_mb,
+                log=self.log,
+                on_file_done=file_done,
+                on_event=self.telemetry.forward if self.telemetry.sinks else None
+            )
+            for input_file, error in failures:
+                self.record_result(input_file, error=error)
+            return failures
+
+        # The model is loaded by the first file that is not fully cached
+        failures = []
+
+        jobs = ({"input_file": input_file} for input_file in files)
+        if self.pipelined and len(files) > 1:
+            # Overlap decoding, ASR, alignment and writing of different files
+            results = StagedPipeline(self.stages(), queue_size=self.queue_size).run(jobs)
+        else:
+            results = (run_stages(job, self.stages()) for job in jobs)
+
+        for job in results:
+            input_file = job["input_file"]
+            self.emit_file_end(job)
+            self.record_result(input_file, job.get("output_dir"), job.get("error"), job.get("audio_seconds"))
+            if "error" in job:
+                self.log(f"Error during transcription of {input_file} ({job['failed_stage']}): {str(job['error'])}")
+                failures.append((input_file, job["error"]))
+                continue
+            self.log(f"Transcription complete for: {input_file}")
+            self.log(f"Files saved in: {job['output_dir']}")
+            if on_file_done:
+                on_file_done(input_file, job["output_dir"])
+        return failures
+
+    def job_settings(self):
+        """Settings that change the output, for deduplicating jobs"""
+        return {
+            "model_name": self.model_name,
+            "language": self.language,
+            "compute_type": self.compute_type,
+            "word_timestamps": self.word_timestamps,
+            "align": self.align_enabled,
+            "diarize": [self.min_speakers, self.max_speakers] if self.diarize else None,
+            "streaming": [self.window_seconds, self.overlap_seconds] if self.streaming else None,
+            "output_formats": self.output_formats,
+            "output_root": str(self.output_root),
+        }
+
+    def submit_jobs(self, files):
+        """Record ``files`` in the job store.
+
+        Returns the files that still need transcribing, and
+        ``(input_file, output_dir)`` for those already done.
+        """
+        self.job_ids = {}
+        settings = self.job_settings()
+        pending = []
+        done = []
+        for input_file in files:
+            try:
+                row = self.job_store.submit(input_file, settings, force=self.force)
+            except OSError:
+                # Unreadable, the file fails with a proper error when it is processed
+                pending.append(input_file)
+                continue
+            if row["status"] == "done":
+                self.log(f"Already transcribed {os.path.basename(input_file)} with these settings: {row['output_dir']}")
+                done.append((input_file, row["output_dir"]))
+                continue
+            self.job_ids[input_file] = row["id"]
+            pending.append(input_file)
+        return pending, done
+
+    def record_result(self, input_file, output_dir=None, error=None, audio_seconds=None):
+        job_id = self.job_ids.pop(input_file, None)
+        if job_id is None:
+            return
+        if error is not None:
+            self.job_store.fail(job_id, error)
+        else:
+            stem = Path(input_file).stem
+            outputs = [Path(output_dir) / f"{stem}.{fmt}" for fmt in self.output_formats]
+            if self.align_enabled:
+                outputs.append(sidecar_path(output_dir, stem))
+            self.job_store.finish(job_id, output_dir, outputs, audio_seconds)
+
+    def schedule(self, files, by_language=True):
+        """Order ``files`` by language and duration, see scheduler.schedule"""
+        def probe_language(input_file):
+            try:
+                return self.detect_language(input_file)
+            except Exception:
+                # The file fails with a proper error when it is processed
+                return None
+
+        ordered = schedule(files, probe_language, by_language=by_language)
+        if ordered != list(files):
+            self.log("Processing order: " + ", ".join(os.path.basename(input_file) for input_file in ordered))
+        return ordered
+
+    def emit_file_end(self, job):
+        self.telemetry.emit(
+            "file_end",
+            file=str(job["input_file"]),
+            status="error" if "error" in job else "ok",
+            failed_stage=job.get("failed_stage"),
+            error=str(job["error"]) if "error" in job else None,
+            duration=round(time.time() - job["started"], 4) if "started" in job else None,
+            audio_seconds=job.get("audio_seconds"),
+            segments=len(job["result"]["segments"]) if "result" in job else None,
+            output_dir=str(job["output_dir"]) if "output_dir" in job else None
+        )
+
+    def worker_settings(self):
+        """Constructor arguments that reproduce this engine in a worker process"""
+        return {
+            "model_name": self.model_name,
+            "language": self.language,
+            "compute_type": self.compute_type,
+            "word_timestamps": self.word_timestamps,
+            "align": self.align_enabled,
+            "diarize": self.diarize,
+            "min_speakers": self.min_speakers,
+            "max_speakers": self.max_speakers,
+            "hf_token": self.hf_token,
+            "diarize_workers": self.diarize_workers,
+            "batch_size": self.batch_size,
+            "device": self.device,
+            "output_root": self.output_root,
+            "cache_dir": self.cache_dir,
+            "audio_cache_mb": self.audio_cache_mb,
+            "streaming": self.streaming,
+            "window_seconds": self.window_seconds,
+            "overlap_seconds": self.overlap_seconds,
+            "resume": self.resume,
+            "output_formats": self.output_formats,
+        }
+
+    def empty_cache(self):
+        if self.device == "cuda":
+            torch.cuda.empty_cache()
+
+    def close(self):
+        # Drop our reference only, the model itself stays in whisper_models
+        # until unload_models() is called or it is evicted
+        self.model = None
+        if self.diarize_pool is not None:
+            self.diarize_pool.shutdown(wait=True)
+            self.diarize_pool = None
+        self.empty_cache()
+
+
+def batch_size_arg(value):
+    if value == "auto":
+        return value
+    batch_size = int(value)
+    if batch_size < 1:
+        raise argparse.ArgumentTypeError("batch size must be at least 1")
+    return batch_size
+
+
+def formats_arg(value):
+    try:
+        return parse_formats(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m engine",
+        description="Transcribe audio/video files with WhisperX without the GUI."
+    )
+    parser.add_argument("inputs", nargs="*", help="input files or glob patterns (e.g. 'recordings/**/*.mp4')")
+    parser.add_argument("--resume-jobs", action="store_true",
+                        help="also transcribe the files left unfinished by an earlier interrupted run")
+    add_engine_arguments(parser)
+    return parser
+
+
+def add_engine_arguments(parser):
+    """Add the transcription options shared by every command line entry point"""
+    parser.add_argument("--model", default="medium", help="Whisper model name (default: medium)")
+    parser.add_argument("--language", default="en",
+                        help="language code, or 'auto' to detect it per file from its first 30 seconds (default: en)")
+    parser.add_argument("--compute-type", default=None, choices=["float32", "float16", "int8"],
+                        help="compute type (default: float16 on CUDA, int8 on CPU)")
+    parser.add_argument("--batch-size", type=batch_size_arg, default=16,
+                        help="transcription batch size, or 'auto' to tune it for this model and device (default: 16)")
+    parser.add_argument("--device", default=None, choices=["cuda", "cpu"], help="device (default: auto)")
+    parser.add_argument("--word-timestamps", action="store_true", help="highlight word timings in the SRT output")
+    parser.add_argument("--align", action=argparse.BooleanOptionalAction, default=None,
+                        help="run forced alignment for word timings (default: only with --word-timestamps)")
+    parser.add_argument("--diarize", action="store_true",
+                        help="label segments and words with speakers using pyannote (needs a Hugging Face token)")
+    parser.add_argument("--min-speakers", type=int, default=None, help="with --diarize, the minimum number of speakers")
+    parser.add_argument("--max-speakers", type=int, default=None, help="with --diarize, the maximum number of speakers")
+    parser.add_argument("--hf-token", default=None,
+                        help="Hugging Face token for the pyannote models (default: $HF_TOKEN)")
+    parser.add_argument("--diarize-workers", type=int, default=1,
+                        help="files diarized at the same time, next to transcription (default: 1)")
+    parser.add_argument("--formats", type=formats_arg, default=DEFAULT_FORMATS,
+                        help=f"comma-separated output formats out of srt,vtt,json,tsv,txt (default: {','.join(DEFAULT_FORMATS)})")
+    parser.add_argument("--output-dir", default="transcripts", help="output root directory (default: transcripts)")
+    parser.add_argument("--model-cache-mb", type=float, default=None,
+                        help="memory limit for resident models in MB (default: $WHISPERXGUI_MODEL_CACHE_MB or unlimited)")
+    parser.add_argument("--align-cache-mb", type=float, default=None,
+                        help="memory limit for cached alignment models in MB (default: $WHISPERXGUI_ALIGN_CACHE_MB or 4096)")
+    parser.add_argument("--serial", action="store_true",
+                        help="process one file at a time instead of overlapping the pipeline stages")
+    parser.add_argument("--queue-size", type=int, default=2,
+                        help="files buffered between pipeline stages (default: 2)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="CPU only: number of worker processes, each with its own model (0 = one per --threads cores)")
+    parser.add_argument("--threads", type=int, default=4, help="intra-op CPU threads per model (default: 4)")
+    parser.add_argument("--worker-memory-mb", type=float, default=None,
+                        help="CPU only: resident memory budget per worker process in MB, checked between files; "
+                             "a worker over it is replaced by a fresh process (default: unlimited)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help="directory for cached transcription/alignment results (default: $WHISPERXGUI_CACHE_DIR or cache)")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the stage cache or the job database")
+    parser.add_argument("--force", action="store_true",
+                        help="transcribe files again even if the job database has them done with the same settings")
+    parser.add_argument("--audio-cache-mb", type=float, default=memory_limit_from_env("WHISPERXGUI_AUDIO_CACHE_MB"),
+                        help="keep up to this many MB of decoded audio as memory-mapped files in the cache directory "
+                             "(default: $WHISPERXGUI_AUDIO_CACHE_MB or disabled)")
+    parser.add_argument("--stream", action="store_true",
+                        help="decode and transcribe in fixed-size windows to bound memory on very long recordings")
+    parser.add_argument("--window-seconds", type=float, default=600, help="streaming window length (default: 600)")
+    parser.add_argument("--overlap-seconds", type=float, default=30,
+                        help="audio shared by consecutive streaming windows (default: 30)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="with --stream, start from zero instead of resuming from an interrupted run's checkpoint")
+    parser.add_argument("--keep-order", action="store_true",
+                        help="process files in the given order instead of grouped by language, longest first")
+    parser.add_argument("--timings", action="store_true", help="log wall time, RTF and peak RSS of every stage")
+    parser.add_argument("--telemetry-jsonl", default=None, help="append structured per-stage events to this JSON Lines file")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus-style metrics on http://127.0.0.1:PORT/metrics while running")
+
+
+def engine_from_args(args, log=print):
+    """Build a TranscriptionEngine from options added by add_engine_arguments"""
+    if args.model_cache_mb is not None:
+        whisper_models.set_memory_limit(args.model_cache_mb)
+    if args.align_cache_mb is not None:
+        align_models.set_memory_limit(args.align_cache_mb)
+
+    telemetry = Telemetry()
+    if args.timings:
+        telemetry.add_sink(LogSink(log))
+    if args.telemetry_jsonl:
+        telemetry.add_sink(JsonlSink(args.telemetry_jsonl))
+    if args.metrics_port is not None:
+        telemetry.add_sink(PrometheusSink(args.metrics_port))
+
+    return TranscriptionEngine(
+        model_name=args.model,
+        language=args.language,
+        compute_type=args.compute_type,
+        word_timestamps=args.word_timestamps,
+        align=args.align,
+        diarize=args.diarize,
+        min_speakers=args.min_speakers,
+        max_speakers=args.max_speakers,
+        hf_token=args.hf_token,
+        diarize_workers=args.diarize_workers,
+        batch_size=args.batch_size,
+        device=args.device,
+        output_root=args.output_dir,
+        pipelined=not args.serial,
+        queue_size=args.queue_size,
+        cpu_threads=args.threads,
+        workers=args.workers or default_worker_count(args.threads),
+        worker_memory_mb=args.worker_memory_mb,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        audio_cache_mb=args.audio_cache_mb,
+        streaming=args.stream,
+        window_seconds=args.window_seconds,
+        overlap_seconds=args.overlap_seconds,
+        resume=not args.no_resume,
+        output_formats=args.formats,
+        reorder=not args.keep_order,
+        job_store=None if args.no_cache else JobStore(default_path(args.cache_dir)),
+        force=args.force,
+        telemetry=telemetry,
+        log=log,
+    )
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+
+    files = expand_inputs(args.inputs)
+    engine = engine_from_args(args)
+    if args.resume_jobs and engine.job_store:
+        files += [input_file for input_file in engine.job_store.unfinished() if input_file not in files]
+    if not files:
+        print("No input files found", file=sys.stderr)
+        return 2
+
+    try:
+        failures = engine.run(files)
+    finally:
+        engine.close()
+
+    print(f"\nProcessed {len(files) - len(failures)}/{len(files)} files")
+    for input_file, error in failures:
+        print(f"FAILED: {input_file}: {error}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Durable job records in SQLite.
+
+Every file submitted to the engine gets a row with its content hash, the
+settings that affect the output, its status, timings and output paths.
+A file whose content was already transcribed with the same settings is
+not transcribed again, and files that were queued or running when the
+process stopped can be picked up again with ``unfinished()``.
+
+Statuses: ``queued``, ``running``, ``done``, ``failed``, and ``cancelled``
+for unfinished jobs that were replaced or removed.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from stage_cache import DEFAULT_CACHE_DIR, StageCache, file_digest
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    input_file TEXT NOT NULL,
+    audio_hash TEXT NOT NULL,
+    settings_key TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    status TEXT NOT NULL,
+    submitted REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    audio_seconds REAL,
+    error TEXT,
+    output_dir TEXT,
+    outputs TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_by_content ON jobs (audio_hash, settings_key);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status);
+"""
+
+
+def default_path(cache_dir=DEFAULT_CACHE_DIR):
+    return Path(cache_dir or DEFAULT_CACHE_DIR) / "jobs.sqlite3"
+
+
+class JobStore:
+    """Thread-safe store of job rows, shared by the pipeline stage threads"""
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else default_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def submit(self, input_file, settings, force=False):
+        """Record ``input_file`` for a run with ``settings``.
+
+        Returns the job row. When the same content was already transcribed
+        with the same settings and its outputs still exist, that finished
+        row is returned instead of a new one, unless ``force`` is set.
+        """
+        input_file = str(input_file)
+        audio_hash = file_digest(input_file)
+        settings_key = StageCache.key("job", settings)
+        if not force:
+            for row in self._execute(
+                    "SELECT * FROM jobs WHERE audio_hash = ? AND settings_key = ? AND status = 'done' "
+                    "ORDER BY finished DESC", (audio_hash, settings_key)):
+                if row["output_dir"] and os.path.isdir(row["output_dir"]):
+                    return dict(row)
+
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            # Older unfinished jobs for this file are replaced by this one
+            self._db.execute(
+                "UPDATE jobs SET status = 'cancelled' WHERE input_file = ? AND status IN ('queued', 'running')",
+                (input_file,))
+            cursor = self._db.execute(
+                "INSERT INTO jobs (input_file, audio_hash, settings_key, settings, status, submitted) "
+                "VALUES (?, ?, ?, ?, 'queued', ?)",
+                (input_file, audio_hash, settings_key, json.dumps(settings, default=str), time.time()))
+            job_id = cursor.lastrowid
+        return self.get(job_id)
+
+    def get(self, job_id):
+        rows = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return dict(rows[0]) if rows else None
+
+    def start(self, job_id):
+        self._execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ?", (time.time(), job_id))
+
+    def finish(self, job_id, output_dir, outputs, audio_seconds=None):
+        self._execute(
+            "UPDATE jobs SET status = 'done', finished = ?, output_dir = ?, outputs = ?, audio_seconds = ?, "
+            "error = NULL WHERE id = ?",
+            (time.time(), str(output_dir), json.dumps([str(path) for path in outputs]), audio_seconds, job_id))
+
+    def fail(self, job_id, error):
+        self._execute("UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE id = ?",
+                      (time.time(), str(error), job_id))
+
+    def cancel(self, input_files):
+        """Drop unfinished jobs for ``input_files`` so they are not restored"""
+        for input_file in input_files:
+            self._execute("UPDATE jobs SET status = 'cancelled' WHERE input_file = ? AND status IN ('queued', 'running')",
+                          (str(input_file),))
+
+    def unfinished(self):
+        """Input files of jobs that were queued or running, oldest first, that still exist"""
+        rows = self._execute(
+            "SELECT input_file, MIN(submitted) AS submitted FROM jobs WHERE status IN ('queued', 'running') "
+            "GROUP BY input_file ORDER BY submitted")
+        return [row["input_file"] for row in rows if os.path.isfile(row["input_file"])]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,68 @@
+"""Per-file spoken language detection.
+
+Only a short leading sample of each file is decoded and passed to the
+Whisper model's language detector. The result is stored in a small sidecar
+next to the input (``<file>.lang.json``), or in the cache directory when the
+input's folder is not writable, so no file is ever analysed twice.
+"""
+import json
+import os
+from pathlib import Path
+
+from stage_cache import DEFAULT_CACHE_DIR, StageCache
+from streaming import load_leading_audio
+
+# Whisper's language detector looks at the first 30 seconds
+SAMPLE_SECONDS = 30
+
+
+def sidecar_path(input_file):
+    return Path(f"{input_file}.lang.json")
+
+
+class LanguageDetector:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.fallback_dir = Path(cache_dir or DEFAULT_CACHE_DIR) / "language"
+
+    @staticmethod
+    def _source(input_file):
+        stat = os.stat(input_file)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    def _fallback_path(self, input_file):
+        key = StageCache.key("language", os.path.realpath(input_file))
+        return self.fallback_dir / f"{key}.json"
+
+    def cached(self, input_file):
+        """The stored language of ``input_file``, or None if it is unknown or stale"""
+        source = self._source(input_file)
+        for path in (sidecar_path(input_file), self._fallback_path(input_file)):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if entry.get("source") == source:
+                return entry["language"]
+        return None
+
+    def store(self, input_file, language, model_name):
+        entry = {"language": language, "model": model_name, "source": self._source(input_file)}
+        try:
+            path = sidecar_path(input_file)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+        except OSError:
+            # Read-only input folder
+            path = self._fallback_path(input_file)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+
+    def detect(self, input_file, model, model_name):
+        """Return the language code of ``input_file``, detecting it at most once"""
+        language = self.cached(input_file)
+        if language is None:
+            language = model.detect_language(load_leading_audio(input_file, SAMPLE_SECONDS))
+            self.store(input_file, language, model_name)
+        return language
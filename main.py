@@ -1,156 +1,58 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext, filedialog, messagebox
+import importlib
 import threading
-import whisperx
 import os
-import sys
-import datetime
-import shutil
-from pathlib import Path
-import queue
-import torch
 import platform
 import subprocess
-import importlib
-import threading
-import time
-import sys
 
-# Lightning automatically upgraded your loaded checkpoint from v1.5.4 to v2.5.1. To apply the upgrade to your files permanently, run
-# `python -m pytorch_lightning.utilities.upgrade_checkpoint G:\WhisperXGUI\.venv\Lib\site-packages\whisperx\assets\pytorch_model.bin`
+from job_store import JobStore
+from telemetry import LogSink, Telemetry
+from ui_bridge import ENGINE_LOADED, LOG, MAX_LOG_LINES, RUN_FAILED, RUN_FINISHED, EventBridge, LogFile
 
-class SplashScreen(tk.Toplevel):
-    def __init__(self):
-        super().__init__()
-
-        # Remove window decorations
-        self.overrideredirect(True)
-
-        # Get screen dimensions
-        screen_width = self.winfo_screenwidth()
-        screen_height = self.winfo_screenheight()
-
-        # Set window dimensions and position
-        width = 300
-        height = 200
-        x = (screen_width - width) // 2
-        y = (screen_height - height) // 2
-        self.geometry(f"{width}x{height}+{x}+{y}")
-
-        # Configure the window
-        self.configure(bg='#2d2d2d')
-
-        # Create and pack widgets
-        title = tk.Label(
-            self,
-            text="WhisperX GUI",
-            font=("Helvetica", 16, "bold"),
-            bg='#2d2d2d',
-            fg='white'
-        )
-        title.pack(pady=(20, 10))
-
-        loading_text = tk.Label(
-            self,
-            text="Loading dependencies...",
-            font=("Helvetica", 10),
-            bg='#2d2d2d',
-            fg='white'
-        )
-        loading_text.pack(pady=5)
+# Wait this long after the last model/language/compute type change before
+# pre-loading the selected models
+PREWARM_DELAY_MS = 800
 
-        # Create a progress bar
-        self.progress = ttk.Progressbar(
-            self,
-            mode='indeterminate',
-            length=200
-        )
-        self.progress.pack(pady=10)
-
-        # Start progress bar animation
-        self.progress.start()
-
-        # Keep track of loaded modules
-        self.status_label = tk.Label(
-            self,
-            text="",
-            font=("Helvetica", 8),
-            bg='#2d2d2d',
-            fg='#a0a0a0',
-            wraplength=280
-        )
-        self.status_label.pack(pady=5)
-
-        # Center the window
-        self.update_idletasks()
-
-        # Make this window stay on top
-        self.attributes('-topmost', True)
-
-    def update_status(self, text):
-        self.status_label.config(text=text)
-        self.update()
-
-def import_with_status(splash_screen):
-    """Import all required modules while updating the splash screen"""
-
-    modules_to_import = [
-        ('tkinter.scrolledtext', 'GUI Components'),
-        ('tkinter.filedialog', 'File Dialog'),
-        ('tkinter.messagebox', 'Message Boxes'),
-        ('whisperx', 'WhisperX Core'),
-        ('torch', 'PyTorch'),
-        ('datetime', 'DateTime Utils'),
-        ('pathlib', 'Path Utils'),
-        ('queue', 'Threading Queue'),
-        ('platform', 'Platform Utils'),
-        ('subprocess', 'Subprocess Utils')
-    ]
-
-    imported_modules = {}
-
-    for module_name, display_name in modules_to_import:
-        splash_screen.update_status(f"Loading {display_name}...")
-        try:
-            imported_modules[module_name] = importlib.import_module(module_name)
-            time.sleep(0.1)  # Give a small delay to show the loading message
-        except ImportError as e:
-            splash_screen.update_status(f"Error loading {display_name}: {str(e)}")
-            time.sleep(2)
-            sys.exit(1)
-
-    return imported_modules
+# Lightning automatically upgraded your loaded checkpoint from v1.5.4 to v2.5.1. To apply the upgrade to your files permanently, run
+# `python -m pytorch_lightning.utilities.upgrade_checkpoint G:\WhisperXGUI\.venv\Lib\site-packages\whisperx\assets\pytorch_model.bin`
 
 
-# Here's where we define our WhisperXGUI class with all the imported modules
 class WhisperXGUI:
-    def __init__(self, root, modules):
+    def __init__(self, root):
         self.root = root
         self.root.title("WhisperX Transcription GUI")
         self.root.geometry("800x600")
 
-        # Unpack needed modules
-        self.scrolledtext = modules['tkinter.scrolledtext']
-        self.filedialog = modules['tkinter.filedialog']
-        self.messagebox = modules['tkinter.messagebox']
-        self.whisperx = modules['whisperx']
-        self.torch = modules['torch']
-        self.Path = modules['pathlib'].Path
-        self.queue = modules['queue'].Queue
-        self.platform = modules['platform']
-        self.subprocess = modules['subprocess']
+        # Worker threads never touch widgets, they post events to the bridge
+        self.events = EventBridge()
+        self.log_file = LogFile()
 
-        # Queue for communication between threads
-        self.output_queue = self.queue()
+        # The engine module pulls in torch and whisperx, which take seconds
+        # to import, so it is loaded in the background after the window is up
+        self.engine = None
+
+        # Models for the current selection are pre-loaded in the background,
+        # one load at a time; a newer selection makes older loads stale
+        self.transcribing = False
+        self.prewarm_after = None
+        self.prewarm_settings = None
+        self.prewarm_generation = 0
+        self.prewarm_lock = threading.Lock()
+        self.prewarmed = []
 
         # List to store multiple file paths
         self.file_list = []
+        # Status of every file sent to the engine, kept across sessions
+        self.job_store = JobStore()
 
         self.setup_ui()
         self.setup_bindings()
+        self.restore_unfinished_files()
 
         # Start the output checking loop
         self.check_output()
+        self.load_engine()
 
     def setup_ui(self):
         # Main frame
@@ -180,6 +82,7 @@ class WhisperXGUI:
         # Language selection with full names
         ttk.Label(main_frame, text="Language:").grid(row=2, column=0, sticky=tk.W, pady=5)
         self.language_mapping = {
+            "Auto-detect": "auto",
             "English": "en",
             "French": "fr",
             "German": "de",
@@ -203,19 +106,47 @@ class WhisperXGUI:
         compute_type_combo = ttk.Combobox(main_frame, textvariable=self.compute_type_var, values=compute_types, state="readonly")
         compute_type_combo.grid(row=3, column=1, sticky=(tk.W, tk.E), pady=5)
 
+        # Batch size selection, "auto" tunes it once per model/device/compute type
+        batch_size_frame = ttk.Frame(main_frame)
+        batch_size_frame.grid(row=1, column=2, sticky=tk.W, padx=5, pady=5)
+        ttk.Label(batch_size_frame, text="Batch Size:").grid(row=0, column=0, sticky=tk.W)
+        self.batch_size_var = tk.StringVar(value="16")
+        batch_sizes = ["auto", "1", "2", "4", "8", "16", "32", "64"]
+        batch_size_combo = ttk.Combobox(batch_size_frame, textvariable=self.batch_size_var, values=batch_sizes, state="readonly", width=6)
+        batch_size_combo.grid(row=0, column=1, padx=5)
+
         # Word timestamps checkbox
         self.word_timestamps_var = tk.BooleanVar(value=False)
         word_timestamps_check = ttk.Checkbutton(main_frame, text="Enable word-level timestamps", variable=self.word_timestamps_var)
         word_timestamps_check.grid(row=3, column=2, sticky=tk.W, pady=5)
 
+        # Speaker diarization checkbox, the pyannote models need $HF_TOKEN
+        self.diarize_var = tk.BooleanVar(value=False)
+        diarize_check = ttk.Checkbutton(main_frame, text="Identify speakers", variable=self.diarize_var)
+        diarize_check.grid(row=2, column=2, sticky=tk.W, pady=5)
+
         # Progress and output
         self.output_text = scrolledtext.ScrolledText(main_frame, height=20, width=70, wrap=tk.WORD)
         self.output_text.grid(row=4, column=0, columnspan=3, pady=10)
         self.output_text.config(state='disabled')
 
-        # Transcribe button
-        self.transcribe_btn = ttk.Button(main_frame, text="✨ Transcribe All", command=self.start_transcription)
-        self.transcribe_btn.grid(row=5, column=0, columnspan=3, pady=10)
+        # Action buttons
+        action_frame = ttk.Frame(main_frame)
+        action_frame.grid(row=5, column=0, columnspan=3, pady=10)
+
+        self.transcribe_btn = ttk.Button(action_frame, text="⏳ Loading WhisperX...", command=self.start_transcription,
+                                         state='disabled')
+        self.transcribe_btn.grid(row=0, column=0, padx=5)
+
+        # Models stay loaded between runs until they are unloaded explicitly
+        self.unload_btn = ttk.Button(action_frame, text="⏏ Unload Models", command=self.unload_models)
+        self.unload_btn.grid(row=0, column=1, padx=5)
+
+        # Files already transcribed with the same settings are skipped and
+        # their earlier output opened, unless this is checked
+        self.force_var = tk.BooleanVar(value=False)
+        force_check = ttk.Checkbutton(action_frame, text="Transcribe again", variable=self.force_var)
+        force_check.grid(row=0, column=2, padx=5)
 
         # Configure grid weights
         self.root.columnconfigure(0, weight=1)
@@ -241,150 +172,187 @@ class WhisperXGUI:
         if selection:
             index = selection[0]
             self.files_listbox.delete(index)
-            self.file_list.pop(index)
+            self.job_store.cancel([self.file_list.pop(index)])
 
     def clear_files(self):
         self.files_listbox.delete(0, tk.END)
+        self.job_store.cancel(self.file_list)
         self.file_list.clear()
 
+    def restore_unfinished_files(self):
+        """Put back the files an interrupted session did not finish"""
+        unfinished = self.job_store.unfinished()
+        for filename in unfinished:
+            self.file_list.append(filename)
+            self.files_listbox.insert(tk.END, os.path.basename(filename))
+        if unfinished:
+            self.events.log(f"Restored {len(unfinished)} unfinished file(s) from the last session")
+
     def setup_bindings(self):
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        for var in (self.model_var, self.language_var, self.compute_type_var, self.word_timestamps_var):
+            var.trace_add("write", lambda *_: self.schedule_prewarm())
 
-    def update_output(self, message):
+    def update_output(self, lines):
+        text = "\n".join(lines) + "\n"
+        self.log_file.write(text)
         self.output_text.config(state='normal')
-        self.output_text.insert(tk.END, message + '\n')
+        self.output_text.insert(tk.END, text)
+        # Keep only the last MAX_LOG_LINES lines on screen, the log file has all of them
+        excess = int(self.output_text.index('end-1c').split('.')[0]) - 1 - MAX_LOG_LINES
+        if excess > 0:
+            self.output_text.delete('1.0', f'{excess + 1}.0')
         self.output_text.see(tk.END)
         self.output_text.config(state='disabled')
 
     def check_output(self):
         try:
-            while True:
-                message = self.output_queue.get_nowait()
-                self.update_output(message)
-        except queue.Empty:
-            pass
+            lines = []
+            for event in self.events.drain():
+                if event.kind == LOG:
+                    lines.append(event.payload)
+                    continue
+                # Show the log up to this event before handling it
+                if lines:
+                    self.update_output(lines)
+                    lines = []
+                self.handle_event(event)
+            if lines:
+                self.update_output(lines)
         finally:
             self.root.after(100, self.check_output)
 
-    def create_output_directory(self, input_file):
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M")
-        base_name = Path(input_file).stem
-        output_dir = Path("transcripts") / f"{base_name}_{timestamp}"
-        output_dir.mkdir(parents=True, exist_ok=True)
-        return output_dir
+    def handle_event(self, event):
+        if event.kind == ENGINE_LOADED:
+            if event.payload is not None:
+                self.update_output([f"Error loading WhisperX: {str(event.payload)}"])
+                messagebox.showerror("Error", f"Could not load WhisperX: {str(event.payload)}")
+                return
+            self.update_output(["WhisperX ready", f"Full log: {self.log_file.path}"])
+            self.transcribe_btn.config(text="✨ Transcribe All", state='normal')
+            self.schedule_prewarm()
+        elif event.kind == RUN_FAILED:
+            messagebox.showerror("Error", f"Transcription failed: {event.payload}")
+        elif event.kind == RUN_FINISHED:
+            self.transcribing = False
+            self.transcribe_btn.config(state='normal')
+            # Pre-load whatever was selected while the run was going
+            self.schedule_prewarm()
+
+    def load_engine(self):
+        def import_engine():
+            try:
+                self.engine = importlib.import_module("engine")
+            except Exception as e:
+                self.events.post(ENGINE_LOADED, e)
+            else:
+                self.events.post(ENGINE_LOADED)
 
-    def transcribe(self, batch_size=16, language="en"):
-        try:
-            if not self.file_list:
-                messagebox.showerror("Error", "Please select at least one input file")
+        self.events.log("Loading WhisperX in the background...")
+        threading.Thread(target=import_engine, daemon=True).start()
+
+    def selected_model_settings(self):
+        return {
+            "model_name": self.model_var.get(),
+            "language": self.language_mapping[self.language_var.get()],
+            "compute_type": self.compute_type_var.get(),
+            "word_timestamps": self.word_timestamps_var.get(),
+        }
+
+    def schedule_prewarm(self):
+        # Restart the delay on every change so only the settled selection loads
+        if self.prewarm_after is not None:
+            self.root.after_cancel(self.prewarm_after)
+        self.prewarm_after = self.root.after(PREWARM_DELAY_MS, self.prewarm)
+
+    def prewarm(self):
+        self.prewarm_after = None
+        if self.engine is None or self.transcribing:
+            return
+        settings = self.selected_model_settings()
+        if settings == self.prewarm_settings:
+            return
+        self.prewarm_settings = settings
+        self.prewarm_generation += 1
+        threading.Thread(target=self.run_prewarm, args=(settings, self.prewarm_generation), daemon=True).start()
+
+    def run_prewarm(self, settings, generation):
+        def is_current():
+            return generation == self.prewarm_generation
+
+        with self.prewarm_lock:
+            if not is_current():
+                return
+            engine = self.engine.TranscriptionEngine(**settings, log=lambda message: None)
+            self.events.log(f"Pre-loading {settings['model_name']} model in the background...")
+            try:
+                self.prewarmed.extend(engine.prewarm(is_current))
+            except Exception as e:
+                self.events.log(f"Pre-loading failed: {str(e)}")
                 return
+            finally:
+                engine.close()
+            if is_current():
+                self.events.log(f"{settings['model_name']} model ready")
+            self.release_stale_models()
+
+    def release_stale_models(self):
+        """Unload pre-loaded models the current selection no longer uses"""
+        if self.transcribing:
+            return
+        settings = self.prewarm_settings or self.selected_model_settings()
+        current = self.engine.TranscriptionEngine(**settings, log=lambda message: None)
+        keep = {current.whisper_key()}
+        if current.align_enabled:
+            keep.add((current.language, current.device))
+        for cache, key in list(self.prewarmed):
+            if key not in keep:
+                cache.unload(key)
+                self.prewarmed.remove((cache, key))
+
+    def transcribe(self, batch_size=None, language="en"):
+        try:
+            if batch_size is None:
+                batch_size = self.batch_size_var.get()
+                if batch_size != "auto":
+                    batch_size = int(batch_size)
 
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            compute_type = self.compute_type_var.get()
             selected_language = self.language_var.get()
             if selected_language != "English":
-                self.output_queue.put(f"Using other language: {selected_language}")
+                self.events.log(f"Using other language: {selected_language}")
                 language = self.language_mapping[selected_language]
             else:
-                self.output_queue.put(f"Using language: {selected_language}")
-
-            # Load model once for all files
-            self.output_queue.put("Loading WhisperX model...")
-            model = whisperx.load_model(
-                self.model_var.get(),
-                device,
-                compute_type=compute_type
+                self.events.log(f"Using language: {selected_language}")
+
+            engine = self.engine.TranscriptionEngine(
+                model_name=self.model_var.get(),
+                language=language,
+                compute_type=self.compute_type_var.get(),
+                word_timestamps=self.word_timestamps_var.get(),
+                diarize=self.diarize_var.get(),
+                batch_size=batch_size,
+                job_store=self.job_store,
+                force=self.force_var.get(),
+                telemetry=Telemetry([LogSink(self.events.log)]),
+                log=self.events.log
             )
+            try:
+                # Open each output directory as soon as its file is done
+                failures = engine.run(list(self.file_list), on_file_done=lambda _, output_dir: self.open_folder(output_dir))
+            finally:
+                engine.close()
+
+            if failures:
+                failed_names = ", ".join(os.path.basename(input_file) for input_file, _ in failures)
+                raise RuntimeError(f"{len(failures)} file(s) failed: {failed_names}")
 
-            for input_file in self.file_list:
-                self.output_queue.put(f"\nStarting transcription of: {input_file}")
-
-                # Create output directory
-                output_dir = self.create_output_directory(input_file)
-                self.output_queue.put(f"Output directory: {output_dir}")
-
-                # Load audio
-                audio = whisperx.load_audio(input_file)
-
-                # Transcribe
-                word_timestamps = self.word_timestamps_var.get()
-                self.output_queue.put(f"Transcribing... (Word timestamps: {'enabled' if word_timestamps else 'disabled'})")
-
-                # WhisperX handles word timestamps differently
-                # First transcribe with Whisper (without word timestamps parameter)
-                self.output_queue.put("Transcribing with WhisperX...")
-                result = model.transcribe(audio, batch_size=batch_size, language=language)
-
-                # Word timestamps will be added in the alignment step
-
-                # Align
-                self.output_queue.put("Aligning transcript...")
-                model_a, metadata = whisperx.load_align_model(
-                    language_code=language,
-                    device=device
-                )
-                # In WhisperX, the align function is where word-level timestamps are generated
-                self.output_queue.put(f"Aligning with word timestamps: {'enabled' if word_timestamps else 'disabled'}")
-
-                # WhisperX align function doesn't have a return_word_timestamps parameter
-                # It always returns word timestamps when available
-                result = whisperx.align(
-                    result["segments"],
-                    model_a,
-                    metadata,
-                    audio,
-                    device,
-                    return_char_alignments=False
-                )
-
-                # Save output files
-                srt_path = output_dir / f"{Path(input_file).stem}.srt"
-                txt_path = output_dir / f"{Path(input_file).stem}.txt"
-
-                # Write SRT file
-                with open(srt_path, 'w', encoding='utf-8') as f:
-                    for i, seg in enumerate(result["segments"], 1):
-                        start = self.format_timestamp(seg["start"])
-                        end = self.format_timestamp(seg["end"])
-                        text = seg['text'].strip()
-
-                        # If word timestamps are enabled and words are available, highlight them
-                        if word_timestamps and 'words' in seg:
-                            highlighted_text = ""
-                            for word in seg['words']:
-                                word_text = word['word']
-                                highlighted_text += f"<font color=\"#ff0000\">{word_text}</font> "
-                            if highlighted_text:
-                                text = highlighted_text.strip()
-
-                        f.write(f"{i}\n{start} --> {end}\n{text}\n\n")
-
-                # Write TXT file
-                with open(txt_path, 'w', encoding='utf-8') as f:
-                    for seg in result["segments"]:
-                        f.write(f"{seg['text'].strip()}\n")
-
-                self.output_queue.put(f"Transcription complete for: {input_file}")
-                self.output_queue.put(f"Files saved in: {output_dir}")
-
-                # Open the output directory
-                self.open_folder(output_dir)
-
-                # Clean up alignment model
-                del model_a
-                torch.cuda.empty_cache()
-
-            # Clean up whisper model
-            del model
-            torch.cuda.empty_cache()
-
-            self.output_queue.put("\nAll files processed successfully!")
+            self.events.log("\nAll files processed successfully!")
 
         except Exception as e:
-            self.output_queue.put(f"Error during transcription: {str(e)}")
-            messagebox.showerror("Error", f"Transcription failed: {str(e)}")
+            self.events.log(f"Error during transcription: {str(e)}")
+            self.events.post(RUN_FAILED, str(e))
         finally:
-            self.transcribe_btn.config(state='normal')
+            self.events.post(RUN_FINISHED)
 
     def open_folder(self, path):
         path = os.path.realpath(path)
@@ -395,46 +363,38 @@ class WhisperXGUI:
         else:  # Linux
             subprocess.run(["xdg-open", path])
 
-    def format_timestamp(self, seconds):
-        hours = int(seconds // 3600)
-        minutes = int((seconds % 3600) // 60)
-        seconds = seconds % 60
-        milliseconds = int((seconds % 1) * 1000)
-        seconds = int(seconds)
-        return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+    def unload_models(self):
+        if self.engine is None:
+            self.events.log("No models loaded")
+            return
+        if self.transcribe_btn.instate(['disabled']):
+            self.events.log("Cannot unload models while a transcription is running")
+            return
+        self.engine.unload_models()
+        self.prewarmed.clear()
+        self.prewarm_settings = None
+        self.events.log("Unloaded all cached models")
 
     def start_transcription(self):
+        if not self.file_list:
+            messagebox.showerror("Error", "Please select at least one input file")
+            return
         self.transcribe_btn.config(state='disabled')
+        # Let a running pre-load finish, Transcribe waits for it instead of
+        # loading the same model twice, but start no further ones
+        self.transcribing = True
+        self.prewarm_generation += 1
+        self.prewarm_settings = None
         threading.Thread(target=self.transcribe, daemon=True).start()
 
     def on_closing(self):
         if messagebox.askokcancel("Quit", "Do you want to quit?"):
+            self.log_file.close()
             self.root.quit()
 
 
-# Function to finish initialization and show main window
-def finish_init():
-    # Create the application instance (stored as a global variable to prevent garbage collection)
-    global app
-    app = WhisperXGUI(root, imported_modules)
-    root.deiconify()  # Show the main window
-    splash.destroy()   # Close the splash screen
-
-
 if __name__ == "__main__":
-    # Create and show the splash screen
     root = tk.Tk()
-    root.withdraw()  # Hide the main window initially
-    splash = SplashScreen()
-
-    # Import dependencies
-    imported_modules = import_with_status(splash)
-
-    # Now import our WhisperXGUI class and global variables
-    splash.update_status("Initializing application...")
-
-    # Schedule the final initialization
-    root.after(1000, finish_init)
-
-    # Start the main loop
-    root.mainloop()
\ No newline at end of file
+    # Stored as a global variable to prevent garbage collection
+    app = WhisperXGUI(root)
+    root.mainloop()
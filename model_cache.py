@@ -0,0 +1,160 @@
+"""Process-wide cache of loaded models.
+
+Models stay loaded between runs and are evicted least-recently-used first
+when the configured memory limit would be exceeded.
+"""
+import gc
+import os
+import threading
+from collections import OrderedDict
+
+# Approximate parameter counts (millions) of the Whisper checkpoints
+WHISPER_PARAMS_M = {
+    "tiny": 39,
+    "base": 74,
+    "small": 244,
+    "medium": 769,
+    "large": 1550,
+    "large-v1": 1550,
+    "large-v2": 1550,
+    "large-v3": 1550,
+    "large-v3-turbo": 809,
+    "turbo": 809,
+}
+
+BYTES_PER_PARAM = {
+    "float32": 4,
+    "float16": 2,
+    "int8_float16": 1,
+    "int8": 1,
+}
+
+
+def estimate_whisper_mb(model_name, compute_type):
+    """Rough resident size of a Whisper model, in MB"""
+    base_name = model_name.replace(".en", "")
+    params_m = WHISPER_PARAMS_M.get(base_name, WHISPER_PARAMS_M["large"])
+    return params_m * BYTES_PER_PARAM.get(compute_type, 4)
+
+
+# Languages whose default aligner is a torchaudio wav2vec2 base model, the
+# rest use large XLSR checkpoints from Hugging Face
+BASE_ALIGN_LANGUAGES = {"en", "fr", "de", "es", "it"}
+
+
+def estimate_align_mb(language_code):
+    """Rough resident size of the default alignment model, in MB"""
+    return 380 if language_code in BASE_ALIGN_LANGUAGES else 1270
+
+
+def memory_limit_from_env(name, default=None):
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
+class ModelCache:
+    """Thread-safe LRU cache of loaded models with a memory budget.
+
+    ``max_memory_mb=None`` means no limit. A model larger than the limit
+    on its own is still loaded, but everything else is evicted first.
+    """
+
+    def __init__(self, max_memory_mb=None):
+        self.max_memory_mb = max_memory_mb
+        self._models = OrderedDict()  # key -> (model, size_mb)
+        self._lock = threading.Lock()
+        self._key_locks = {}
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._models
+
+    def __len__(self):
+        with self._lock:
+            return len(self._models)
+
+    def keys(self):
+        with self._lock:
+            return list(self._models)
+
+    def loading(self, key):
+        """True while another thread is loading ``key``"""
+        with self._lock:
+            return key in self._key_locks
+
+    @property
+    def memory_mb(self):
+        with self._lock:
+            return sum(size_mb for _, size_mb in self._models.values())
+
+    def get(self, key, loader, size_mb=0):
+        """Return the cached model for ``key``, calling ``loader()`` on a miss.
+
+        Concurrent calls for the same key wait for a single load.
+        """
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key][0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    return self._models[key][0]
+
+            # Make room before loading so peak memory stays within the limit
+            self._evict_for(size_mb)
+            try:
+                model = loader()
+                with self._lock:
+                    self._models[key] = (model, size_mb)
+            finally:
+                # Also after a failed load, so loading() does not report it forever
+                with self._lock:
+                    if self._key_locks.get(key) is key_lock:
+                        del self._key_locks[key]
+            return model
+
+    def set_memory_limit(self, max_memory_mb):
+        self.max_memory_mb = max_memory_mb
+        self._evict_for(0)
+
+    def unload(self, key=None):
+        """Drop one model, or every model when ``key`` is None"""
+        with self._lock:
+            if key is None:
+                self._models.clear()
+            else:
+                self._models.pop(key, None)
+        gc.collect()
+
+    def _evict_for(self, size_mb):
+        if self.max_memory_mb is None:
+            return
+        evicted = False
+        with self._lock:
+            used = sum(entry_size for _, entry_size in self._models.values())
+            while self._models and used + size_mb > self.max_memory_mb:
+                _, (_, entry_size) = self._models.popitem(last=False)
+                used -= entry_size
+                evicted = True
+        if evicted:
+            gc.collect()
+
+
+# Whisper models keyed by (model, device, compute_type)
+whisper_models = ModelCache(memory_limit_from_env("WHISPERXGUI_MODEL_CACHE_MB"))
+
+# Alignment (model, metadata) pairs keyed by (language_code, device)
+align_models = ModelCache(memory_limit_from_env("WHISPERXGUI_ALIGN_CACHE_MB", 4096))
+
+# Diarization pipelines keyed by (model, device)
+diarize_models = ModelCache()
@@ -0,0 +1,103 @@
+"""Staged job pipeline with bounded queues.
+
+Each stage runs in its own thread, so different files can be decoded,
+transcribed, aligned and written at the same time. The queues between the
+stages are bounded, which limits how many decoded files are held in memory.
+"""
+import queue
+import threading
+
+_DONE = object()
+
+
+def run_stages(job, stages):
+    """Run ``job`` through ``stages`` serially, recording the first error"""
+    for name, func in stages:
+        if "error" in job:
+            break
+        try:
+            job = func(job)
+        except Exception as e:
+            job["error"] = e
+            job["failed_stage"] = name
+    if "error" in job:
+        # Do not keep large intermediate data around for failed jobs
+        job.pop("audio", None)
+    return job
+
+
+class StagedPipeline:
+    """Runs jobs through ``stages``, a list of ``(name, func)`` tuples.
+
+    ``func(job)`` returns the job for the next stage. A stage that raises
+    marks the job with ``error`` and ``failed_stage``; the remaining stages
+    skip it. Jobs come out of ``run`` in the order they went in.
+    """
+
+    def __init__(self, stages, queue_size=2):
+        self.stages = list(stages)
+        self.queue_size = queue_size
+
+    def run(self, jobs):
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        stop = threading.Event()
+
+        threads = [threading.Thread(target=self._feed, args=(jobs, queues[0], stop), daemon=True)]
+        for i, stage in enumerate(self.stages):
+            threads.append(threading.Thread(
+                target=self._work,
+                args=(stage, queues[i], queues[i + 1], stop),
+                name=f"pipeline-{stage[0]}",
+                daemon=True
+            ))
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                job = self._get(queues[-1], stop)
+                if job is _DONE or job is None:
+                    break
+                yield job
+        finally:
+            # Also reached when the caller stops iterating early
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def _feed(self, jobs, out_queue, stop):
+        try:
+            for job in jobs:
+                if not self._put(out_queue, job, stop):
+                    return
+        finally:
+            self._put(out_queue, _DONE, stop)
+
+    def _work(self, stage, in_queue, out_queue, stop):
+        while True:
+            job = self._get(in_queue, stop)
+            if job is _DONE or job is None:
+                self._put(out_queue, _DONE, stop)
+                return
+            job = run_stages(job, [stage])
+            if not self._put(out_queue, job, stop):
+                return
+
+    @staticmethod
+    def _get(q, stop):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    @staticmethod
+    def _put(q, item, stop):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -0,0 +1,68 @@
+"""Batch ordering.
+
+Files are processed in the order returned by ``schedule``, not the order
+they were added in:
+
+- files that need the same alignment model run back to back, so each
+  aligner is loaded once per batch instead of once per language switch
+- within a group, and across worker processes, the longest files start
+  first, so one long recording does not run alone at the end of the batch
+"""
+import os
+import subprocess
+
+
+def probe_duration(path):
+    """Duration of ``path`` in seconds from the container header, or None"""
+    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+           "-of", "default=noprint_wrappers=1:nokey=1", str(path)]
+    try:
+        output = subprocess.run(cmd, capture_output=True, text=True, timeout=30).stdout
+        return float(output.strip())
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+
+class ScheduledFile:
+    def __init__(self, input_file, duration, language):
+        self.input_file = input_file
+        self.duration = duration
+        self.language = language
+
+    @property
+    def weight(self):
+        # Files ffprobe cannot read go last, by size
+        if self.duration is None:
+            try:
+                size = os.path.getsize(self.input_file)
+            except OSError:
+                # Gone or unreadable, it fails with a proper error when it is processed
+                size = 0
+            return (0, size)
+        return (1, self.duration)
+
+
+def longest_first(items):
+    return sorted(items, key=lambda item: item.weight, reverse=True)
+
+
+def schedule(files, language=None, by_language=True):
+    """Return ``files`` reordered for the shortest total run time.
+
+    ``language(input_file)`` returns a file's language; with
+    ``by_language=False`` files are only ordered longest first, which suits
+    worker processes that each keep their own aligners.
+    """
+    items = [ScheduledFile(input_file, probe_duration(input_file),
+                           language(input_file) if language and by_language else None)
+             for input_file in files]
+    if not by_language:
+        return [item.input_file for item in longest_first(items)]
+
+    groups = {}
+    for item in items:
+        groups.setdefault(item.language, []).append(item)
+    # The group holding the longest file starts first
+    ordered = sorted((longest_first(group) for group in groups.values()),
+                     key=lambda group: group[0].weight, reverse=True)
+    return [item.input_file for group in ordered for item in group]
@@ -0,0 +1,414 @@
+"""Local HTTP transcription service.
+
+Runs the same engine as the GUI behind a small JSON API, with the models
+kept loaded between jobs:
+
+- ``POST /jobs?filename=NAME`` with the file as the request body, or
+  ``POST /jobs`` with ``{"path": "/local/file"}`` when started with
+  ``--allow-local-paths``: queue a file, answers ``202`` with the job
+- ``GET /jobs/ID``: job status
+- ``GET /jobs/ID/result/FORMAT``: the finished ``srt``, ``txt`` or ``json``
+  (or any other format written, see ``--formats``)
+- ``GET /health``: queue and worker counts
+
+At most ``--concurrency`` jobs run at once and at most ``--queue-depth``
+wait. Further submissions get ``429 Too Many Requests`` and a
+``Retry-After`` estimate, and ``503`` once the service is shutting down.
+Uploads sent with ``Expect: 100-continue`` are refused before the body is
+sent; other refused bodies are read and dropped so the client gets the
+answer.
+Running jobs share the engine and its model: only one of them transcribes
+at a time, the others overlap decoding, alignment and writing.
+
+Usage:
+    python -m server [options]
+    curl --data-binary @talk.mp3 "http://127.0.0.1:8765/jobs?filename=talk.mp3"
+"""
+import argparse
+import collections
+import json
+import math
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from engine import add_engine_arguments, engine_from_args
+
+CHUNK_SIZE = 1 << 20
+
+CONTENT_TYPES = {
+    "srt": "application/x-subrip; charset=utf-8",
+    "vtt": "text/vtt; charset=utf-8",
+    "json": "application/json; charset=utf-8",
+    "tsv": "text/tab-separated-values; charset=utf-8",
+    "txt": "text/plain; charset=utf-8",
+}
+
+
+class QueueFull(Exception):
+    pass
+
+
+class ShuttingDown(Exception):
+    pass
+
+
+class JobQueue:
+    """Runs submitted files through ``engine`` on ``concurrency`` worker threads
+
+    Only the last ``keep_jobs`` finished jobs are kept, older ones are
+    forgotten; their outputs stay on disk.
+    """
+
+    def __init__(self, engine, concurrency=1, queue_depth=16, keep_jobs=1000, log=print):
+        self.engine = engine
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.keep_jobs = keep_jobs
+        self.log = log
+        self.jobs = {}
+        # Ids of finished jobs, oldest first
+        self._done = collections.deque()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._waiting = 0
+        self._running = 0
+        self._closed = False
+        # Average job time, for Retry-After
+        self._finished = 0
+        self._busy_seconds = 0.0
+        self._workers = [threading.Thread(target=self._work, daemon=True) for _ in range(concurrency)]
+        for worker in self._workers:
+            worker.start()
+
+    def reserve(self):
+        """Claim a queue slot before accepting a job, raises QueueFull or ShuttingDown"""
+        with self._lock:
+            if self._closed:
+                raise ShuttingDown()
+            if self._waiting >= self.queue_depth:
+                raise QueueFull()
+            self._waiting += 1
+
+    def release(self):
+        """Give back a slot from ``reserve`` that was not used"""
+        with self._lock:
+            self._waiting -= 1
+
+    def submit(self, input_file, upload_dir=None):
+        """Queue ``input_file`` in a slot claimed with ``reserve`` and return its job"""
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "input_file": str(input_file),
+            "submitted": time.time(),
+            "started": None,
+            "finished": None,
+            "error": None,
+            "outputs": {},
+        }
+        with self._lock:
+            self.jobs[job["id"]] = job
+        self._queue.put((job, upload_dir))
+        return job
+
+    def retry_after(self):
+        """Seconds until a queue slot is likely to be free"""
+        with self._lock:
+            average = self._busy_seconds / self._finished if self._finished else 60.0
+        return max(1, math.ceil(average / self.concurrency))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._waiting,
+                "running": self._running,
+                "queue_depth": self.queue_depth,
+                "concurrency": self.concurrency,
+                "jobs": len(self.jobs),
+            }
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            job, upload_dir = item
+            with self._lock:
+                self._waiting -= 1
+                self._running += 1
+            job["status"] = "running"
+            job["started"] = time.time()
+            try:
+                # Each job gets its own directory, so two uploads with the same
+                # name never write over each other
+                output_dir = self.engine.process_file(job["input_file"], Path(self.engine.output_root) / job["id"])
+            except Exception as e:
+                job["error"] = f"{type(e).__name__}: {e}"
+                job["status"] = "failed"
+            else:
+                stem = Path(job["input_file"]).stem
+                job["outputs"] = {fmt: str(Path(output_dir) / f"{stem}.{fmt}") for fmt in self.engine.output_formats}
+                job["status"] = "done"
+            finally:
+                job["finished"] = time.time()
+                # Uploaded inputs are not needed once the outputs exist
+                if upload_dir:
+                    shutil.rmtree(upload_dir, ignore_errors=True)
+                with self._lock:
+                    self._running -= 1
+                    self._finished += 1
+                    self._busy_seconds += job["finished"] - job["started"]
+                    self._done.append(job["id"])
+                    while len(self._done) > self.keep_jobs:
+                        del self.jobs[self._done.popleft()]
+            self.log(f"Job {job['id']} {job['status']}: {job['input_file']}")
+
+    def close(self):
+        """Refuse new jobs, finish the queued ones and stop the workers"""
+        with self._lock:
+            self._closed = True
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+
+
+def make_handler(jobs, upload_dir, allow_local_paths=False):
+    class TranscriptionHandler(BaseHTTPRequestHandler):
+        # HTTP/1.1 so a client sending "Expect: 100-continue" is refused
+        # before it uploads anything
+        protocol_version = "HTTP/1.1"
+        # Close idle keep-alive connections and stalled uploads
+        timeout = 60
+        # A slot claimed in handle_expect_100 for the POST that follows
+        reserved = False
+        # Bytes of the request body not read yet
+        unread = 0
+
+        def send_json(self, status, body, headers=()):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def send_error_json(self, status, message, headers=()):
+            self.send_json(status, {"error": message}, headers)
+
+        def read_body(self, size):
+            data = self.rfile.read(min(size, self.unread))
+            self.unread -= len(data)
+            return data
+
+        def discard_body(self):
+            """Read and drop the rest of the body, so the client sees the answer
+            instead of a reset connection, and the next request starts cleanly"""
+            while self.unread > 0:
+                if not self.read_body(CHUNK_SIZE):
+                    self.close_connection = True
+                    return
+
+        def refusal(self):
+            """Claim a queue slot, or return the 429/503 to answer instead"""
+            try:
+                jobs.reserve()
+            except QueueFull:
+                return 429, "queue is full", [("Retry-After", str(jobs.retry_after()))]
+            except ShuttingDown:
+                return 503, "shutting down", [("Retry-After", "30")]
+            return None
+
+        def handle_expect_100(self):
+            if self.command == "POST" and urlparse(self.path).path.rstrip("/") == "/jobs":
+                refused = self.refusal()
+                if refused:
+                    # The body has not been sent, refuse it and close the connection
+                    status, message, headers = refused
+                    self.send_error_json(status, message, [*headers, ("Connection", "close")])
+                    return False
+                self.reserved = True
+            return super().handle_expect_100()
+
+        def do_GET(self):
+            parts = [part for part in urlparse(self.path).path.split("/") if part]
+            if parts == ["health"]:
+                self.send_json(200, jobs.stats())
+                return
+            if len(parts) not in (2, 4) or parts[0] != "jobs" or (len(parts) == 4 and parts[2] != "result"):
+                self.send_error_json(404, "not found")
+                return
+
+            job = jobs.get(parts[1])
+            if job is None:
+                self.send_error_json(404, "no such job")
+                return
+            if len(parts) == 2:
+                self.send_json(200, job)
+                return
+
+            fmt = parts[3]
+            if job["status"] != "done":
+                self.send_error_json(409, f"job is {job['status']}")
+                return
+            if fmt not in job["outputs"]:
+                self.send_error_json(404, f"no {fmt} output, available: {', '.join(job['outputs'])}")
+                return
+            path = job["outputs"][fmt]
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPES.get(fmt, "application/octet-stream"))
+            self.send_header("Content-Length", str(os.path.getsize(path)))
+            self.end_headers()
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, self.wfile, CHUNK_SIZE)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            reserved, self.reserved = self.reserved, False
+            length = self.headers.get("Content-Length")
+            if length is None or not length.isdigit():
+                # Without it the body cannot be skipped either
+                self.send_error_json(411, "Content-Length is required", [("Connection", "close")])
+                if reserved:
+                    jobs.release()
+                return
+            self.unread = int(length)
+
+            if url.path.rstrip("/") != "/jobs":
+                self.discard_body()
+                self.send_error_json(404, "not found")
+                return
+
+            # Claim a slot before storing the body, so a full queue costs no disk
+            # space, but still read it: a client that is cut off mid-upload
+            # never sees the 429 and its Retry-After
+            if not reserved:
+                refused = self.refusal()
+                if refused:
+                    self.discard_body()
+                    self.send_error_json(*refused)
+                    return
+
+            try:
+                input_file, job_upload_dir = self.read_input(url)
+            except BaseException as e:
+                # Give the slot back before answering, whatever went wrong
+                jobs.release()
+                if isinstance(e, ValueError):
+                    self.discard_body()
+                    self.send_error_json(400, str(e))
+                elif isinstance(e, OSError):
+                    self.discard_body()
+                    self.send_error_json(500, str(e))
+                else:
+                    self.close_connection = True
+                    raise
+                return
+
+            job = jobs.submit(input_file, job_upload_dir)
+            self.send_json(202, job, [("Location", f"/jobs/{job['id']}")])
+
+        def read_input(self, url):
+            """Return the input path and, for uploads, the directory holding it"""
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                if not allow_local_paths:
+                    raise ValueError("local paths are disabled, upload the file instead")
+                body = json.loads(self.read_body(self.unread))
+                if not isinstance(body, dict):
+                    raise ValueError("expected a JSON object with a path")
+                path = body.get("path")
+                if not isinstance(path, str) or not os.path.isfile(path):
+                    raise ValueError(f"no such file: {path}")
+                return path, None
+
+            filename = os.path.basename(parse_qs(url.query).get("filename", [""])[0])
+            if filename in ("", ".", ".."):
+                raise ValueError("the filename query parameter must name a file for uploads")
+            job_upload_dir = Path(upload_dir) / uuid.uuid4().hex
+            job_upload_dir.mkdir(parents=True)
+            path = job_upload_dir / filename
+            try:
+                with open(path, 'wb') as f:
+                    while self.unread > 0:
+                        data = self.read_body(CHUNK_SIZE)
+                        if not data:
+                            break
+                        f.write(data)
+                if self.unread:
+                    self.close_connection = True
+                    raise ValueError("upload ended early")
+            except BaseException:
+                shutil.rmtree(job_upload_dir, ignore_errors=True)
+                raise
+            return path, job_upload_dir
+
+        def log_message(self, *args):
+            pass
+
+    return TranscriptionHandler
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m server",
+        description="Serve WhisperX transcription over a local HTTP API."
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="port to listen on (default: 8765)")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="jobs processed at the same time; they share one model, so only one transcribes "
+                             "at a time while the others decode, align or write (default: 1)")
+    parser.add_argument("--queue-depth", type=int, default=16,
+                        help="jobs allowed to wait before submissions are refused with 429 (default: 16)")
+    parser.add_argument("--keep-jobs", type=int, default=1000,
+                        help="finished jobs whose status and results stay available, older ones are "
+                             "forgotten but their outputs stay on disk (default: 1000)")
+    parser.add_argument("--upload-dir", default="uploads", help="where uploaded files are kept until transcribed (default: uploads)")
+    parser.add_argument("--allow-local-paths", action="store_true",
+                        help="accept {\"path\": ...} submissions of files already on this machine")
+    add_engine_arguments(parser)
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+
+    engine = engine_from_args(args)
+    # Jobs run one file each, the queue does the batching
+    engine.pipelined = False
+    engine.load_model()
+
+    jobs = JobQueue(engine, args.concurrency, args.queue_depth, args.keep_jobs)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(jobs, args.upload_dir, args.allow_local_paths))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Listening on http://{args.host}:{args.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        # Keep answering status requests while the queued jobs finish
+        print("Shutting down, finishing queued jobs...")
+        jobs.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+        engine.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
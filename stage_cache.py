@@ -0,0 +1,76 @@
+"""Persistent content-addressed cache for pipeline stage results.
+
+Entries are keyed by a hash of the audio file content plus the settings
+that affect a stage, so re-running a batch (or changing only settings that
+come later in the pipeline) skips the expensive stages.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = os.environ.get("WHISPERXGUI_CACHE_DIR", "cache")
+
+# In-process memo of file digests keyed by (path, size, mtime)
+_digests = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of the file content"""
+    stat = os.stat(path)
+    memo_key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+    with _digests_lock:
+        if memo_key in _digests:
+            return _digests[memo_key]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    result = digest.hexdigest()
+
+    with _digests_lock:
+        _digests[memo_key] = result
+    return result
+
+
+def _to_json(value):
+    # numpy scalars and arrays as produced by whisperx
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+class StageCache:
+    """Stores JSON-serialisable stage results under ``root/<stage>/``"""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.root = Path(root)
+
+    @staticmethod
+    def key(*parts):
+        return hashlib.sha256(json.dumps(parts, default=str).encode('utf-8')).hexdigest()
+
+    def path(self, stage, key):
+        return self.root / stage / key[:2] / f"{key}.json"
+
+    def load(self, stage, key):
+        try:
+            with open(self.path(stage, key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # A corrupt entry is treated as a miss and overwritten later
+            return None
+
+    def store(self, stage, key, value):
+        path = self.path(stage, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first so readers never see a partial entry
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(value, f, default=_to_json)
+        os.replace(tmp_path, path)
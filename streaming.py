@@ -0,0 +1,156 @@
+"""Bounded-memory streaming transcription for very long recordings.
+
+Audio is decoded by ffmpeg straight into fixed-size windows instead of one
+array for the whole file. Consecutive windows overlap, so speech cut at a
+window edge is heard in full by one of them. Segments are emitted as soon
+as their window is processed, so peak memory depends on the window size
+and not on the length of the recording.
+"""
+import math
+import subprocess
+
+import numpy as np
+import whisperx
+
+SAMPLE_RATE = 16000
+
+
+def _read_exact(stream, size):
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        data = stream.read(remaining)
+        if not data:
+            break
+        chunks.append(data)
+        remaining -= len(data)
+    return b"".join(chunks)
+
+
+def iter_audio_windows(path, window_seconds, overlap_seconds, start_seconds=0.0, sr=SAMPLE_RATE):
+    """Yield ``(offset_seconds, samples, is_last)`` windows of 16 kHz mono audio.
+
+    Every window after the first starts with the last ``overlap_seconds`` of
+    the previous one.
+    """
+    window = int(window_seconds * sr)
+    overlap = int(overlap_seconds * sr)
+    if not 0 <= overlap < window:
+        raise ValueError("overlap must be shorter than the window")
+    step = window - overlap
+
+    # Same conversion as whisperx.load_audio, but read incrementally
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0"]
+    if start_seconds:
+        cmd += ["-ss", f"{start_seconds:.3f}"]
+    cmd += ["-i", str(path), "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sr), "-"]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def read(count):
+        data = _read_exact(process.stdout, count * 2)
+        return np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+
+    offset = start_seconds
+    produced = False
+    try:
+        chunk = read(window)
+        while len(chunk):
+            carry = chunk[step:]
+            # Read the next window's new audio before yielding this one, so a
+            # recording that ends exactly on a window edge still gets is_last
+            samples = read(window - len(carry)) if len(chunk) == window else chunk[:0]
+            is_last = len(samples) == 0
+            produced = True
+            yield offset, chunk, is_last
+            if is_last:
+                break
+            chunk = np.concatenate([carry, samples])
+            offset += step / sr
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        returncode = process.wait()
+
+    if not produced and returncode != 0:
+        raise RuntimeError(f"Failed to load audio: ffmpeg exited with code {returncode}")
+
+
+def load_leading_audio(path, seconds, sr=SAMPLE_RATE):
+    """Decode only the first ``seconds`` of ``path`` as 16 kHz mono audio"""
+    cmd = ["ffmpeg", "-nostdin", "-threads", "0", "-i", str(path), "-t", f"{seconds:.3f}",
+           "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sr), "-"]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        data = _read_exact(process.stdout, int(seconds * sr) * 2)
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        returncode = process.wait()
+    if not data:
+        if returncode != 0:
+            raise RuntimeError(f"Failed to load audio: ffmpeg exited with code {returncode}")
+        raise RuntimeError(f"No audio found in {path}")
+    return np.frombuffer(data, np.int16).astype(np.float32) / 32768.0
+
+
+def _shift(segment, offset):
+    segment["start"] += offset
+    segment["end"] += offset
+    for word in segment.get("words", []):
+        if "start" in word:
+            word["start"] += offset
+        if "end" in word:
+            word["end"] += offset
+    return segment
+
+
+def stream_segments(engine, input_file, align=True, start_seconds=0.0, emitted_until=None,
+                    on_window_done=None, language=None):
+    """Transcribe ``input_file`` window by window, yielding segments in order.
+
+    Segment and word timestamps are absolute. ``engine`` supplies the
+    models and settings (``window_seconds``, ``overlap_seconds``,
+    ``language``, ``device``) and runs the Whisper model; ``language``
+    overrides the engine's language for this file.
+
+    Once every segment of a window has been consumed,
+    ``on_window_done(offset, emitted_until)`` is called. Passing those two
+    values back as ``start_seconds`` and ``emitted_until`` resumes the
+    stream right after that window.
+    """
+    language = language or engine.language
+    if align:
+        model_a, metadata = engine.load_align_model(language)
+
+    if emitted_until is None:
+        emitted_until = start_seconds
+    windows = iter_audio_windows(input_file, engine.window_seconds, engine.overlap_seconds, start_seconds)
+    for offset, audio, is_last in windows:
+        result = engine.transcribe_audio(audio, language)
+        if align and result["segments"]:
+            result = whisperx.align(
+                result["segments"],
+                model_a,
+                metadata,
+                audio,
+                engine.device,
+                return_char_alignments=False
+            )
+
+        # Segments starting in the overlap at the end of this window are left
+        # to the next window, which hears them with their full context
+        boundary = math.inf if is_last else offset + len(audio) / SAMPLE_RATE - engine.overlap_seconds
+        for segment in result["segments"]:
+            segment = _shift(segment, offset)
+            if segment["start"] >= boundary:
+                continue
+            # Already covered by a segment emitted from the previous window
+            if (segment["start"] + segment["end"]) / 2 < emitted_until:
+                continue
+            emitted_until = max(emitted_until, segment["end"])
+            yield segment
+
+        if on_window_done and not is_last:
+            on_window_done(boundary, emitted_until)
@@ -0,0 +1,303 @@
+"""Subtitle and transcript writers.
+
+``SubtitleWriter`` serialises segments to every requested format in a single
+pass over the segments, with buffered writes:
+
+- ``srt``: SubRip, optionally with highlighted words
+- ``vtt``: WebVTT, with inline word timestamps when word timestamps are on
+- ``json``: segments with their word-level start/end/score
+- ``tsv``: one segment per line, start and end in milliseconds
+- ``txt``: plain text, one segment per line
+
+``IncrementalWriter`` appends segments as they are produced and keeps a
+checkpoint of the last finished audio offset, so an interrupted streaming
+job can resume where it stopped instead of starting again from zero.
+"""
+import json
+import math
+import os
+from pathlib import Path
+
+FORMATS = ("srt", "vtt", "json", "tsv", "txt")
+DEFAULT_FORMATS = ("srt", "txt", "json")
+
+BUFFER_SIZE = 1 << 16
+
+
+def format_timestamp(seconds, separator=","):
+    total_ms = int(seconds * 1000)
+    hours, total_ms = divmod(total_ms, 3_600_000)
+    minutes, total_ms = divmod(total_ms, 60_000)
+    secs, milliseconds = divmod(total_ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{milliseconds:03d}"
+
+
+def parse_formats(value):
+    """Parse a comma-separated format list such as ``"srt,vtt,json"``"""
+    formats = tuple(fmt.strip().lower() for fmt in value.split(",") if fmt.strip())
+    unknown = [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown:
+        raise ValueError(f"unknown output format(s): {', '.join(unknown)}")
+    return formats
+
+
+def _number(value):
+    # whisperx returns numpy floats and NaN for words it could not align
+    if value is None:
+        return None
+    value = float(value)
+    return None if math.isnan(value) else round(value, 3)
+
+
+def segment_record(index, seg):
+    """JSON-ready copy of a segment, keeping the word timings"""
+    record = {
+        "id": index,
+        "start": _number(seg["start"]),
+        "end": _number(seg["end"]),
+        "text": seg["text"].strip(),
+    }
+    if "speaker" in seg:
+        record["speaker"] = seg["speaker"]
+    if "words" in seg:
+        words = []
+        for word in seg["words"]:
+            entry = {"word": word["word"]}
+            for key in ("start", "end", "score"):
+                if key in word:
+                    entry[key] = _number(word[key])
+            if "speaker" in word:
+                entry["speaker"] = word["speaker"]
+            words.append(entry)
+        record["words"] = words
+    return record
+
+
+def speaker_prefix(seg):
+    # Set by diarization
+    return f"[{seg['speaker']}] " if seg.get("speaker") else ""
+
+
+def format_srt_entry(index, seg, word_timestamps=False):
+    start = format_timestamp(seg["start"])
+    end = format_timestamp(seg["end"])
+    text = seg['text'].strip()
+
+    # If word timestamps are enabled and words are available, highlight them
+    if word_timestamps and seg.get('words'):
+        text = " ".join(f"<font color=\"#ff0000\">{word['word']}</font>" for word in seg['words'])
+
+    return f"{index}\n{start} --> {end}\n{speaker_prefix(seg)}{text}\n\n"
+
+
+def format_vtt_entry(seg, word_timestamps=False):
+    start = format_timestamp(seg["start"], ".")
+    end = format_timestamp(seg["end"], ".")
+    text = seg['text'].strip()
+
+    # WebVTT supports karaoke-style timestamps inside the cue text
+    if word_timestamps and seg.get('words'):
+        parts = []
+        for word in seg['words']:
+            if "start" in word and _number(word["start"]) is not None:
+                parts.append(f"<{format_timestamp(word['start'], '.')}><c>{word['word']}</c>")
+            else:
+                parts.append(word['word'])
+        text = " ".join(parts)
+
+    return f"{start} --> {end}\n{speaker_prefix(seg)}{text}\n\n"
+
+
+def format_tsv_entry(seg):
+    text = seg['text'].strip().replace("\t", " ")
+    return f"{int(seg['start'] * 1000)}\t{int(seg['end'] * 1000)}\t{text}\n"
+
+
+class SubtitleWriter:
+    """Writes segments to several formats at once as they are passed in"""
+
+    def __init__(self, output_dir, stem, formats=DEFAULT_FORMATS, word_timestamps=False, language=None):
+        self.paths = {fmt: Path(output_dir) / f"{stem}.{fmt}" for fmt in formats}
+        self.word_timestamps = word_timestamps
+        self.language = language
+        self.index = 0
+        self._files = {}
+
+    def open(self, sizes=None, index=0):
+        """Open the files; with ``sizes`` continue them from those byte offsets"""
+        self.index = index
+        for fmt, path in self.paths.items():
+            if sizes is not None:
+                os.truncate(path, sizes[fmt])
+                self._files[fmt] = open(path, 'ab', buffering=BUFFER_SIZE)
+            else:
+                self._files[fmt] = open(path, 'wb', buffering=BUFFER_SIZE)
+                header = self._header(fmt)
+                if header:
+                    self._files[fmt].write(header.encode('utf-8'))
+
+    def _header(self, fmt):
+        if fmt == "vtt":
+            return "WEBVTT\n\n"
+        if fmt == "tsv":
+            return "start\tend\ttext\n"
+        if fmt == "json":
+            return '{"language": ' + json.dumps(self.language) + ', "segments": [\n'
+        return ""
+
+    def write(self, seg):
+        self.index += 1
+        files = self._files
+        if "srt" in files:
+            files["srt"].write(format_srt_entry(self.index, seg, self.word_timestamps).encode('utf-8'))
+        if "vtt" in files:
+            files["vtt"].write(format_vtt_entry(seg, self.word_timestamps).encode('utf-8'))
+        if "json" in files:
+            separator = ",\n" if self.index > 1 else ""
+            record = json.dumps(segment_record(self.index, seg), ensure_ascii=False)
+            files["json"].write(f"{separator}{record}".encode('utf-8'))
+        if "tsv" in files:
+            files["tsv"].write(format_tsv_entry(seg).encode('utf-8'))
+        if "txt" in files:
+            files["txt"].write(f"{speaker_prefix(seg)}{seg['text'].strip()}\n".encode('utf-8'))
+
+    def write_all(self, segments):
+        for seg in segments:
+            self.write(seg)
+
+    def flush(self, sync=False):
+        for f in self._files.values():
+            f.flush()
+            if sync:
+                os.fsync(f.fileno())
+
+    def sizes(self):
+        return {fmt: f.tell() for fmt, f in self._files.items()}
+
+    def close(self):
+        if "json" in self._files:
+            self._files["json"].write(b"\n]}\n")
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+
+def write_outputs(output_dir, stem, segments, formats=DEFAULT_FORMATS, word_timestamps=False, language=None):
+    """Write ``segments`` to every format in ``formats`` in one pass"""
+    writer = SubtitleWriter(output_dir, stem, formats, word_timestamps, language)
+    writer.open()
+    try:
+        writer.write_all(segments)
+    finally:
+        writer.close()
+    return writer.paths
+
+
+def checkpoint_path(output_dir, stem):
+    return Path(output_dir) / f"{stem}.checkpoint.json"
+
+
+def find_checkpoint(output_root, input_file, settings_key):
+    """Return the newest output directory with a resumable checkpoint for ``input_file``"""
+    stem = Path(input_file).stem
+    candidates = sorted(Path(output_root).glob(f"{stem}_*/{stem}.checkpoint.json"),
+                        key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in candidates:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if state.get("settings_key") == settings_key:
+            return path.parent
+    return None
+
+
+class IncrementalWriter(SubtitleWriter):
+    """Writes segments as they arrive, with a resumable checkpoint.
+
+    ``checkpoint(offset, emitted_until)`` makes everything written so far
+    durable and records that audio before ``offset`` is done. On resume the
+    files are truncated back to the last checkpoint, which drops anything
+    written after it.
+
+    With ``keep_words=True`` the words of every segment are also kept in a
+    ``<stem>.words.jsonl`` file under the same checkpoint, whatever the
+    formats, and ``finish`` returns them.
+    """
+
+    def __init__(self, output_dir, stem, settings_key, formats=DEFAULT_FORMATS, word_timestamps=False,
+                 language=None, keep_words=False):
+        super().__init__(output_dir, stem, formats, word_timestamps, language)
+        if keep_words:
+            self.paths["words"] = Path(output_dir) / f"{stem}.words.jsonl"
+        self.checkpoint_path = checkpoint_path(output_dir, stem)
+        self.settings_key = settings_key
+        self.offset = 0.0
+        self.emitted_until = 0.0
+
+    def load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.get("settings_key") != self.settings_key:
+            return None
+        return state
+
+    def open(self, resume=True):
+        """Open the output files, returns True when resuming from a checkpoint"""
+        state = self.load_checkpoint() if resume else None
+        if state and set(state["sizes"]) == set(self.paths) and all(path.exists() for path in self.paths.values()):
+            self.offset = state["offset"]
+            self.emitted_until = state["emitted_until"]
+            # Drop whatever was written after the last checkpoint
+            super().open(sizes=state["sizes"], index=state["index"])
+            return True
+
+        super().open()
+        self.checkpoint(0.0, 0.0)
+        return False
+
+    def write(self, seg):
+        super().write(seg)
+        if "words" in self._files:
+            record = {"start": seg["start"], "words": seg.get("words", [])}
+            self._files["words"].write(f"{json.dumps(record, ensure_ascii=False)}\n".encode('utf-8'))
+
+    def checkpoint(self, offset, emitted_until):
+        self.flush(sync=True)
+        self.offset = offset
+        self.emitted_until = emitted_until
+        state = {
+            "settings_key": self.settings_key,
+            "index": self.index,
+            "offset": offset,
+            "emitted_until": emitted_until,
+            "sizes": self.sizes(),
+        }
+        tmp_path = self.checkpoint_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def finish(self):
+        """Close the files and remove the checkpoint, the output is complete.
+
+        Returns the kept ``{"start", "words"}`` segments with ``keep_words``,
+        including those written before a resume, otherwise None.
+        """
+        self.close()
+        word_segments = None
+        if "words" in self.paths:
+            with open(self.paths["words"], 'r', encoding='utf-8') as f:
+                word_segments = [json.loads(line) for line in f]
+            self.paths.pop("words").unlink()
+        try:
+            self.checkpoint_path.unlink()
+        except FileNotFoundError:
+            pass
+        return word_segments
@@ -0,0 +1,247 @@
+"""Structured per-file and per-stage telemetry.
+
+The engine emits events as plain dicts to any number of sinks:
+
+- ``LogSink`` writes a one-line summary to a log callable such as the GUI log
+- ``JsonlSink`` appends every event to a JSON Lines file
+- ``PrometheusSink`` aggregates events and serves them in the Prometheus
+  text format on ``/metrics``
+
+Event types are ``file_start``, ``stage``, ``model_load`` and ``file_end``.
+Every event has ``event`` and ``ts`` (Unix time) fields.
+"""
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def resident_mb():
+    """Current resident set size of this process in MB, or None if it cannot be read"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        pass
+    # macOS and the BSDs have no /proc
+    try:
+        output = subprocess.run(["ps", "-o", "rss=", "-p", str(os.getpid())],
+                                capture_output=True, text=True, timeout=5).stdout
+        return int(output.strip()) / 1024
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB, or None if it cannot be read"""
+    rss = resident_mb()
+    if rss is not None:
+        return rss
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Lifetime peak only: KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class PeakRss:
+    """Samples the RSS in a background thread while the block runs"""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak_mb = None
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self.peak_mb = current_rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._update()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._update()
+
+    def _update(self):
+        rss = current_rss_mb()
+        if rss is not None and (self.peak_mb is None or rss > self.peak_mb):
+            self.peak_mb = rss
+
+
+class Telemetry:
+    """Fans events out to sinks, each a callable taking the event dict"""
+
+    def __init__(self, sinks=()):
+        self.sinks = list(sinks)
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def emit(self, event, **fields):
+        if not self.sinks:
+            return
+        self.forward({"event": event, "ts": time.time(), **fields})
+
+    def forward(self, record):
+        """Send an event built elsewhere, e.g. in a worker process, to the sinks"""
+        for sink in self.sinks:
+            try:
+                sink(record)
+            except Exception:
+                # A broken sink must never fail a transcription
+                pass
+
+    @contextmanager
+    def stage(self, stage, input_file):
+        """Time a stage; the yielded dict collects extra fields for the event"""
+        fields = {}
+        if not self.sinks:
+            yield fields
+            return
+
+        start = time.time()
+        status, error = "ok", None
+        rss = PeakRss(interval=0.05)
+        rss.__enter__()
+        try:
+            yield fields
+        except BaseException as e:
+            status, error = "error", f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            rss.__exit__(None, None, None)
+            end = time.time()
+            self.emit(
+                "stage",
+                file=str(input_file),
+                stage=stage,
+                start=start,
+                end=end,
+                duration=round(end - start, 4),
+                peak_rss_mb=round(rss.peak_mb, 1) if rss.peak_mb is not None else None,
+                status=status,
+                error=error,
+                **fields
+            )
+
+
+class LogSink:
+    """Human-readable summaries for a log callable"""
+
+    def __init__(self, log=print):
+        self.log = log
+
+    def __call__(self, record):
+        if record["event"] == "stage":
+            line = f"[{record['stage']}] {os.path.basename(record['file'])}: {record['duration']:.2f}s"
+            if record.get("audio_seconds"):
+                line += f" (RTF {record['duration'] / record['audio_seconds']:.3f})"
+            if record.get("peak_rss_mb") is not None:
+                line += f", peak RSS {record['peak_rss_mb']:.0f} MB"
+            if record.get("cached"):
+                line += ", cached"
+            if record.get("status") == "error":
+                line += ", failed"
+            self.log(line)
+        elif record["event"] == "model_load":
+            self.log(f"[model] loaded {record['kind']} model {record['name']} in {record['duration']:.2f}s")
+
+
+class JsonlSink:
+    """Appends one JSON object per event to ``path``"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record, default=str) + "\n"
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+
+class PrometheusSink:
+    """Aggregates events into counters served on ``http://host:port/metrics``"""
+
+    def __init__(self, port=None, host="127.0.0.1"):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self.server = None
+        if port is not None:
+            self.serve(port, host)
+
+    def __call__(self, record):
+        event = record["event"]
+        with self._lock:
+            if event == "stage":
+                labels = (("stage", record["stage"]), ("status", record["status"]))
+                self._inc("whisperx_stage_runs_total", labels, 1)
+                self._inc("whisperx_stage_seconds_total", labels[:1], record["duration"])
+                if record.get("audio_seconds"):
+                    self._inc("whisperx_stage_audio_seconds_total", labels[:1], record["audio_seconds"])
+                if record.get("peak_rss_mb") is not None:
+                    key = ("whisperx_stage_peak_rss_mb", labels[:1])
+                    self._gauges[key] = max(self._gauges.get(key, 0), record["peak_rss_mb"])
+            elif event == "model_load":
+                labels = (("kind", record["kind"]),)
+                self._inc("whisperx_model_loads_total", labels, 1)
+                self._inc("whisperx_model_load_seconds_total", labels, record["duration"])
+            elif event == "file_end":
+                self._inc("whisperx_files_total", (("status", record["status"]),), 1)
+                if record.get("audio_seconds"):
+                    self._inc("whisperx_audio_seconds_total", (), record["audio_seconds"])
+                if record.get("segments"):
+                    self._inc("whisperx_segments_total", (), record["segments"])
+
+    def _inc(self, name, labels, value):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted({name for name, _ in metrics}):
+                    lines.append(f"# TYPE {name} {kind}")
+                    for (metric, labels), value in sorted(metrics.items()):
+                        if metric != name:
+                            continue
+                        label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+                        lines.append(f"{name}{{{label_text}}} {value:g}" if label_text else f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        sink = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = sink.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server
@@ -0,0 +1,228 @@
+"""Stage-level benchmark for the transcription pipeline.
+
+Generates synthetic audio fixtures (speech-like signals and silence) of fixed
+lengths, runs them through the engine on CPU and reports wall time, real-time
+factor and peak RSS for the decode, transcribe, align (with --word-timestamps)
+and write stages.
+Results are saved as JSON; pass an earlier result with --compare to flag
+throughput regressions.
+
+Usage:
+    python tools/benchmark.py --model tiny --lengths 30 120
+    python tools/benchmark.py --compare benchmarks/baseline.json
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+# Allow running as `python tools/benchmark.py` from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from telemetry import PeakRss  # noqa: E402
+
+SAMPLE_RATE = 16000
+
+
+def write_speech_like(path, seconds, seed=0):
+    """Harmonic voiced bursts with a drifting pitch, syllable-rate envelope and pauses"""
+    rng = random.Random(seed)
+    frames = bytearray()
+    t = 0
+    total = int(seconds * SAMPLE_RATE)
+    while t < total:
+        # A "word" of 150-450 ms followed by a 50-400 ms gap
+        word = int(rng.uniform(0.15, 0.45) * SAMPLE_RATE)
+        gap = int(rng.uniform(0.05, 0.4) * SAMPLE_RATE)
+        f0 = rng.uniform(100, 220)
+        phase = 0.0
+        for i in range(min(word, total - t)):
+            envelope = math.sin(math.pi * i / word)
+            pitch = f0 * (1 + 0.05 * math.sin(2 * math.pi * 3 * i / SAMPLE_RATE))
+            phase += 2 * math.pi * pitch / SAMPLE_RATE
+            sample = sum(math.sin(h * phase) / h for h in range(1, 6))
+            sample = 0.3 * envelope * sample + rng.gauss(0, 0.01)
+            frames += struct.pack("<h", max(-32767, min(32767, int(sample * 32767))))
+        t += word
+        silent = min(gap, max(0, total - t))
+        frames += b"\0\0" * silent
+        t += silent
+    _write_wav(path, frames)
+
+
+def write_silence(path, seconds):
+    _write_wav(path, b"\0\0" * int(seconds * SAMPLE_RATE))
+
+
+def _write_wav(path, frames):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(bytes(frames))
+
+
+def make_fixtures(directory, lengths):
+    fixtures = []
+    for seconds in lengths:
+        speech = Path(directory) / f"speech_{seconds}s.wav"
+        write_speech_like(speech, seconds, seed=seconds)
+        fixtures.append(("speech", seconds, speech))
+        silence = Path(directory) / f"silence_{seconds}s.wav"
+        write_silence(silence, seconds)
+        fixtures.append(("silence", seconds, silence))
+    return fixtures
+
+
+def run_benchmark(args, work_dir):
+    import torch
+    import whisperx
+    from engine import TranscriptionEngine
+
+    torch.set_num_threads(args.threads)
+    (work_dir / "fixtures").mkdir()
+    fixtures = make_fixtures(work_dir / "fixtures", args.lengths)
+
+    engine = TranscriptionEngine(
+        model_name=args.model,
+        language=args.language,
+        compute_type=args.compute_type,
+        word_timestamps=args.word_timestamps,
+        batch_size=args.batch_size,
+        device="cpu",
+        output_root=work_dir / "transcripts",
+        pipelined=False,
+        cpu_threads=args.threads,
+        cache_dir=None,
+        log=lambda message: None
+    )
+
+    report = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "whisperx": getattr(whisperx, "__version__", "unknown"),
+            "cpu_count": os.cpu_count(),
+            "model": args.model,
+            "compute_type": args.compute_type,
+            "batch_size": args.batch_size,
+            "threads": args.threads,
+            "language": args.language,
+            "word_timestamps": args.word_timestamps,
+        },
+        "results": [],
+    }
+
+    with PeakRss() as rss:
+        start = time.perf_counter()
+        engine.load_model()
+        if engine.align_enabled:
+            engine.load_align_model(args.language)
+        report["meta"]["model_load_seconds"] = round(time.perf_counter() - start, 3)
+    report["meta"]["model_load_peak_rss_mb"] = rss.peak_mb
+
+    for kind, seconds, path in fixtures:
+        job = {"input_file": str(path)}
+        stages = {}
+        for name, stage in engine.stages():
+            with PeakRss() as rss:
+                start = time.perf_counter()
+                job = stage(job)
+                elapsed = time.perf_counter() - start
+            stages[name] = {
+                "wall_seconds": round(elapsed, 4),
+                "rtf": round(elapsed / seconds, 5),
+                "peak_rss_mb": round(rss.peak_mb, 1) if rss.peak_mb is not None else None,
+            }
+        total = sum(stage["wall_seconds"] for stage in stages.values())
+        report["results"].append({
+            "fixture": f"{kind}_{seconds}s",
+            "kind": kind,
+            "audio_seconds": seconds,
+            "segments": len(job["result"]["segments"]),
+            "stages": stages,
+            "total_wall_seconds": round(total, 4),
+            "total_rtf": round(total / seconds, 5),
+        })
+        print(format_result(report["results"][-1]))
+
+    return report
+
+
+def format_result(result):
+    parts = [f"{result['fixture']:>16}  total {result['total_wall_seconds']:8.2f}s  RTF {result['total_rtf']:.4f}"]
+    for name, stage in result["stages"].items():
+        parts.append(f"    {name:<10} {stage['wall_seconds']:8.3f}s  RTF {stage['rtf']:.4f}  peak RSS {stage['peak_rss_mb']} MB")
+    return "\n".join(parts)
+
+
+def compare(report, baseline, tolerance):
+    """Return (fixture, stage, old_rtf, new_rtf) for every stage that got slower than ``tolerance`` allows"""
+    old_results = {result["fixture"]: result for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        old = old_results.get(result["fixture"])
+        if not old:
+            continue
+        for name, stage in result["stages"].items():
+            old_stage = old["stages"].get(name)
+            if not old_stage or not old_stage["rtf"]:
+                continue
+            if stage["rtf"] > old_stage["rtf"] * (1 + tolerance):
+                regressions.append((result["fixture"], name, old_stage["rtf"], stage["rtf"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the transcription pipeline stages on CPU.")
+    parser.add_argument("--model", default="tiny", help="Whisper model name (default: tiny)")
+    parser.add_argument("--language", default="en", help="language code (default: en)")
+    parser.add_argument("--compute-type", default="int8", choices=["float32", "int8"], help="compute type (default: int8)")
+    parser.add_argument("--batch-size", type=int, default=8, help="transcription batch size (default: 8)")
+    parser.add_argument("--threads", type=int, default=4, help="CPU threads (default: 4)")
+    parser.add_argument("--word-timestamps", action="store_true", help="include the align stage")
+    parser.add_argument("--lengths", type=int, nargs="+", default=[30, 120, 600],
+                        help="fixture lengths in seconds (default: 30 120 600)")
+    parser.add_argument("--output", default=None, help="JSON output path (default: benchmarks/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="earlier JSON result to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed relative RTF increase before a stage counts as a regression (default: 0.15)")
+    args = parser.parse_args(argv)
+
+    work_dir = Path(tempfile.mkdtemp(prefix="whisperx_bench_"))
+    try:
+        report = run_benchmark(args, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    output = Path(args.output or Path("benchmarks") / f"{datetime.datetime.now():%Y-%m-%d_%H-%M-%S}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for fixture, stage, old_rtf, new_rtf in regressions:
+            print(f"REGRESSION {fixture} {stage}: RTF {old_rtf:.4f} -> {new_rtf:.4f}")
+        if regressions:
+            return 1
+        print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, scrolledtext, messagebox
-import re
 import os
+import sys
 import threading
 import time
 import subprocess
@@ -9,6 +9,11 @@ from pathlib import Path
 from datetime import datetime
 import pygame
 
+# Allow running as `python tools/srt_visualizer.py` from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from word_timings import WordTimeline, load_words  # noqa: E402
+
 class SRTVisualizer:
     def __init__(self, root):
         self.root = root
@@ -22,6 +27,8 @@ class SRTVisualizer:
         self.srt_file = None
         self.audio_file = None
         self.words = []  # List of (word, start_time, end_time) tuples
+        self.timeline = WordTimeline([])
+        self.highlighted = set()  # Indices of the words currently highlighted
         self.playing = False
         self.current_time = 0
         self.start_time = 0
@@ -113,42 +120,6 @@ class SRTVisualizer:
         if file_path:
             self.audio_path_var.set(file_path)
 
-    def parse_srt(self, srt_file):
-        with open(srt_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        # Extract segments
-        segments = re.findall(r'(\d+)\n(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\n(.*?)(?=\n\n|\Z)',
-                             content, re.DOTALL)
-
-        words = []
-        for _, start_time, end_time, text in segments:
-            # Extract words with font tags
-            word_matches = re.findall(r'<font color="#ff0000">(.*?)</font>', text)
-
-            if word_matches:
-                # Convert timestamp to seconds
-                start_seconds = self.timestamp_to_seconds(start_time)
-                end_seconds = self.timestamp_to_seconds(end_time)
-
-                # Calculate approximate time for each word
-                word_count = len(word_matches)
-                duration = end_seconds - start_seconds
-                word_duration = duration / word_count
-
-                # Assign timestamps to each word
-                for i, word in enumerate(word_matches):
-                    word_start = start_seconds + (i * word_duration)
-                    word_end = word_start + word_duration
-                    words.append((word, word_start, word_end))
-
-        return words
-
-    def timestamp_to_seconds(self, timestamp):
-        h, m, rest = timestamp.split(':')
-        s, ms = rest.split(',')
-        return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
-
     def seconds_to_timestamp(self, seconds):
         h = int(seconds // 3600)
         m = int((seconds % 3600) // 60)
@@ -181,8 +152,11 @@ class SRTVisualizer:
                 messagebox.showerror("Error", "Please select a valid audio file or place it in the same folder as the SRT file")
                 return
 
-        # Parse SRT file
-        self.words = self.parse_srt(srt_file)
+        # Load word timings, from the .words sidecar when there is one
+        if hasattr(self.words, "close"):
+            self.words.close()
+        self.words = load_words(srt_file)
+        self.timeline = WordTimeline(self.words)
 
         if not self.words:
             messagebox.showwarning("Warning", "No word timestamps found in the SRT file. Make sure it contains word-level timestamps.")
@@ -222,24 +196,20 @@ class SRTVisualizer:
 
     def display_text(self):
         self.text_display.delete(1.0, tk.END)
+        self.highlighted = set()
 
         # Create a plain text version
-        plain_text = " ".join([word[0] for word in self.words])
+        plain_text = " ".join(word for word, _, _ in self.words)
         self.text_display.insert(tk.END, plain_text)
 
-        # Create word indices for highlighting
+        # Create word indices for highlighting, words are separated by one space
         self.word_indices = []
-        current_index = "1.0"
+        offset = 0
 
         for word, _, _ in self.words:
-            # Find the word in the text
-            start_index = self.text_display.search(word, current_index, tk.END)
-            if not start_index:
-                continue
-
-            end_index = f"{start_index}+{len(word)}c"
-            self.word_indices.append((start_index, end_index))
-            current_index = end_index
+            end = offset + len(word)
+            self.word_indices.append((f"1.0+{offset}c", f"1.0+{end}c"))
+            offset = end + 1
 
     def toggle_playback(self):
         if not self.audio_file or not os.path.exists(self.audio_file):
@@ -286,6 +256,7 @@ class SRTVisualizer:
 
             # Remove all highlights
             self.text_display.tag_remove("highlight", "1.0", tk.END)
+            self.highlighted = set()
         except Exception as e:
             messagebox.showerror("Error", f"Error stopping playback: {str(e)}")
 
@@ -314,18 +285,23 @@ class SRTVisualizer:
                 break
 
     def highlight_current_words(self, current_time):
-        # Remove all highlights
-        self.text_display.tag_remove("highlight", "1.0", tk.END)
-
         # Find words that should be highlighted
-        for i, (_, start_time, end_time) in enumerate(self.words):  # Use _ to ignore unused variable
-            if start_time <= current_time <= end_time:
-                if i < len(self.word_indices):
-                    start_idx, end_idx = self.word_indices[i]
-                    self.text_display.tag_add("highlight", start_idx, end_idx)
-
-                    # Ensure the highlighted word is visible
-                    self.text_display.see(start_idx)
+        active = set(self.timeline.active(current_time))
+
+        # Only touch the words whose highlight changed
+        for i in self.highlighted - active:
+            if i < len(self.word_indices):
+                self.text_display.tag_remove("highlight", *self.word_indices[i])
+
+        added = sorted(active - self.highlighted)
+        for i in added:
+            if i < len(self.word_indices):
+                self.text_display.tag_add("highlight", *self.word_indices[i])
+        self.highlighted = active
+
+        # Ensure the highlighted word is visible
+        if added and added[-1] < len(self.word_indices):
+            self.text_display.see(self.word_indices[added[-1]][0])
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -1,10 +1,15 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, scrolledtext, messagebox
-import re
 import os
+import sys
 import time
 from pathlib import Path
 
+# Allow running as `python tools/srt_word_viewer.py` from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from word_timings import WordTimeline, load_words  # noqa: E402
+
 class SRTWordViewer:
     def __init__(self, root):
         self.root = root
@@ -14,7 +19,9 @@ class SRTWordViewer:
         # Variables
         self.srt_file = None
         self.words = []  # List of (word, start_time, end_time) tuples
+        self.timeline = WordTimeline([])
         self.current_word_index = 0
+        self.highlighted_index = None  # Index of the word currently highlighted
         self.timer_running = False
         self.timer_id = None
         
@@ -81,42 +88,6 @@ class SRTWordViewer:
         if file_path:
             self.srt_path_var.set(file_path)
     
-    def parse_srt(self, srt_file):
-        with open(srt_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # Extract segments
-        segments = re.findall(r'(\d+)\n(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\n(.*?)(?=\n\n|\Z)', 
-                             content, re.DOTALL)
-        
-        words = []
-        for _, start_time, end_time, text in segments:
-            # Extract words with font tags
-            word_matches = re.findall(r'<font color="#ff0000">(.*?)</font>', text)
-            
-            if word_matches:
-                # Convert timestamp to seconds
-                start_seconds = self.timestamp_to_seconds(start_time)
-                end_seconds = self.timestamp_to_seconds(end_time)
-                
-                # Calculate approximate time for each word
-                word_count = len(word_matches)
-                duration = end_seconds - start_seconds
-                word_duration = duration / word_count
-                
-                # Assign timestamps to each word
-                for i, word in enumerate(word_matches):
-                    word_start = start_seconds + (i * word_duration)
-                    word_end = word_start + word_duration
-                    words.append((word, word_start, word_end))
-        
-        return words
-    
-    def timestamp_to_seconds(self, timestamp):
-        h, m, rest = timestamp.split(':')
-        s, ms = rest.split(',')
-        return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
-    
     def seconds_to_timestamp(self, seconds):
         h = int(seconds // 3600)
         m = int((seconds % 3600) // 60)
@@ -131,8 +102,11 @@ class SRTWordViewer:
             messagebox.showerror("Error", "Please select a valid SRT file")
             return
         
-        # Parse SRT file
-        self.words = self.parse_srt(srt_file)
+        # Load word timings, from the .words sidecar when there is one
+        if hasattr(self.words, "close"):
+            self.words.close()
+        self.words = load_words(srt_file)
+        self.timeline = WordTimeline(self.words)
         
         if not self.words:
             messagebox.showwarning("Warning", "No word timestamps found in the SRT file. Make sure it contains word-level timestamps.")
@@ -154,24 +128,20 @@ class SRTWordViewer:
     
     def display_text(self):
         self.text_display.delete(1.0, tk.END)
+        self.highlighted_index = None
         
         # Create a plain text version
-        plain_text = " ".join([word[0] for word in self.words])
+        plain_text = " ".join(word for word, _, _ in self.words)
         self.text_display.insert(tk.END, plain_text)
         
-        # Create word indices for highlighting
+        # Create word indices for highlighting, words are separated by one space
         self.word_indices = []
-        current_index = "1.0"
+        offset = 0
         
         for word, _, _ in self.words:
-            # Find the word in the text
-            start_index = self.text_display.search(word, current_index, tk.END)
-            if not start_index:
-                continue
-                
-            end_index = f"{start_index}+{len(word)}c"
-            self.word_indices.append((start_index, end_index))
-            current_index = end_index
+            end = offset + len(word)
+            self.word_indices.append((f"1.0+{offset}c", f"1.0+{end}c"))
+            offset = end + 1
     
     def start_simulation(self):
         """Start simulating playback by highlighting words based on their timestamps"""
@@ -211,28 +181,17 @@ class SRTWordViewer:
         elapsed_time = (time.time() - self.start_time) * self.speed_var.get()
         self.time_var.set(self.seconds_to_timestamp(elapsed_time))
         
-        # Find the current word based on elapsed time
-        current_index = self.current_word_index
-        found = False
-        
-        for i, (_, start_time, end_time) in enumerate(self.words):
-            if start_time <= elapsed_time <= end_time:
-                current_index = i
-                found = True
-                break
-            elif start_time > elapsed_time:
-                # We've gone past the current time, use the previous word
-                if i > 0:
-                    current_index = i - 1
-                found = True
-                break
-        
-        # If we didn't find a word and we're past the last word's end time, stop the simulation
-        if not found and elapsed_time > self.words[-1][2]:
+        # If we're past the last word's end time, stop the simulation
+        if elapsed_time > self.timeline.end:
             self.stop_simulation()
             messagebox.showinfo("Simulation Complete", "Reached the end of the transcript.")
             return
         
+        # Find the current word based on elapsed time, or keep the previous one before the first word
+        current_index = self.timeline.current(elapsed_time)
+        if current_index is None:
+            current_index = self.current_word_index
+        
         # Update the highlighted word if it changed
         if current_index != self.current_word_index:
             self.current_word_index = current_index
@@ -256,13 +215,16 @@ class SRTWordViewer:
         if not self.words or index >= len(self.words):
             return
         
-        # Remove all highlights
-        self.text_display.tag_remove("highlight", "1.0", tk.END)
+        # Remove the previous highlight
+        if self.highlighted_index is not None and self.highlighted_index < len(self.word_indices):
+            self.text_display.tag_remove("highlight", *self.word_indices[self.highlighted_index])
+        self.highlighted_index = None
         
         # Highlight the specified word
         if index < len(self.word_indices):
             start_idx, end_idx = self.word_indices[index]
             self.text_display.tag_add("highlight", start_idx, end_idx)
+            self.highlighted_index = index
             
             # Ensure the highlighted word is visible
             self.text_display.see(start_idx)
@@ -0,0 +1,72 @@
+"""Event bridge from worker threads to the Tk main loop.
+
+Tk widgets may only be touched from the thread running the main loop.
+Worker threads ``post`` typed events instead, and the main loop drains
+them in one go on every poll, so a burst of log lines from a large batch
+turns into a single redraw.
+
+The log shown in the window is capped at ``MAX_LOG_LINES``; ``LogFile``
+keeps every line on disk.
+"""
+import datetime
+import queue
+from collections import namedtuple
+from pathlib import Path
+
+# Event kinds
+LOG = "log"                      # payload: message
+ENGINE_LOADED = "engine_loaded"  # payload: None, or the import error
+RUN_FAILED = "run_failed"        # payload: error message
+RUN_FINISHED = "run_finished"    # payload: None
+
+MAX_LOG_LINES = 2000
+
+UiEvent = namedtuple("UiEvent", "kind payload")
+
+
+class EventBridge:
+    """Thread-safe queue of ``UiEvent`` for the Tk thread to drain"""
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+
+    def post(self, kind, payload=None):
+        self._queue.put(UiEvent(kind, payload))
+
+    def log(self, message):
+        self.post(LOG, message)
+
+    def drain(self, limit=10000):
+        """Return the pending events, at most ``limit`` so a flood cannot stall the UI"""
+        events = []
+        try:
+            while len(events) < limit:
+                events.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return events
+
+
+class LogFile:
+    """Appends every log line to ``logs/whisperxgui_<timestamp>.log``"""
+
+    def __init__(self, directory="logs"):
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        self.path = Path(directory) / f"whisperxgui_{timestamp}.log"
+        self._file = None
+
+    def write(self, text):
+        try:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(text)
+            self._file.flush()
+        except OSError:
+            # The on-screen log still works without the file
+            pass
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,168 @@
+"""Watch-folder daemon.
+
+Polls one or more input directories, waits until new media files have
+stopped growing, and transcribes them with models that stay loaded between
+batches. Each finished input is moved to a ``processed`` (or ``failed``)
+folder inside its watched directory, or left in place with a
+``.done``/``.failed`` marker next to it.
+
+Usage:
+    python -m watcher [options] DIRECTORY [DIRECTORY ...]
+"""
+import argparse
+import datetime
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+from engine import add_engine_arguments, engine_from_args
+from language_detection import sidecar_path
+
+MEDIA_EXTENSIONS = {
+    ".mp4", ".mkv", ".mov", ".wmv", ".avi", ".flv",
+    ".mp3", ".wav", ".aac", ".flac", ".ogg", ".m4a",
+}
+
+PROCESSED_DIR = "processed"
+FAILED_DIR = "failed"
+
+
+def marker_path(path, ok):
+    return Path(f"{path}.{'done' if ok else 'failed'}")
+
+
+class FolderWatcher:
+    """Finds media files in ``directories`` that are complete and not yet handled.
+
+    A file counts as complete once its size and modification time have not
+    changed for ``settle_seconds``. With ``mark=True`` handled files stay in
+    place and get a marker file, otherwise they are moved.
+    """
+
+    def __init__(self, directories, settle_seconds=10, recursive=False, mark=False, log=print):
+        self.directories = [Path(directory) for directory in directories]
+        self.settle_seconds = settle_seconds
+        self.recursive = recursive
+        self.mark = mark
+        self.log = log
+        # path -> ((size, mtime_ns), time the file was first seen that way)
+        self._seen = {}
+
+    def _candidates(self):
+        for directory in self.directories:
+            paths = directory.rglob("*") if self.recursive else directory.iterdir()
+            for path in paths:
+                if path.suffix.lower() not in MEDIA_EXTENSIONS or not path.is_file():
+                    continue
+                # Skip our own output folders
+                if {PROCESSED_DIR, FAILED_DIR} & set(path.relative_to(directory).parts[:-1]):
+                    continue
+                if self.mark and (marker_path(path, True).exists() or marker_path(path, False).exists()):
+                    continue
+                yield path
+
+    @property
+    def pending(self):
+        """Number of files seen but not yet stable"""
+        return sum(1 for (size, _), _ in self._seen.values() if size > 0)
+
+    def poll(self):
+        """Return the files that have been stable for ``settle_seconds``"""
+        now = time.monotonic()
+        ready = []
+        current = set()
+        for path in self._candidates():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            current.add(path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+            previous = self._seen.get(path)
+            if previous is None or previous[0] != signature:
+                # New or still being written, start waiting again
+                self._seen[path] = (signature, now)
+            elif stat.st_size > 0 and now - previous[1] >= self.settle_seconds:
+                ready.append(str(path))
+        for path in set(self._seen) - current:
+            del self._seen[path]
+        return sorted(ready)
+
+    def finish(self, input_file, ok):
+        """Move or mark ``input_file`` so it is not picked up again"""
+        path = Path(input_file)
+        self._seen.pop(path, None)
+        if self.mark:
+            marker_path(path, ok).write_text(datetime.datetime.now().isoformat(timespec="seconds") + "\n")
+            return
+
+        directory = next(directory for directory in self.directories if directory in path.parents)
+        target_dir = directory / (PROCESSED_DIR if ok else FAILED_DIR) / path.parent.relative_to(directory)
+        target_dir.mkdir(parents=True, exist_ok=True)
+        target = target_dir / path.name
+        if target.exists():
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            target = target_dir / f"{path.stem}_{timestamp}{path.suffix}"
+        try:
+            shutil.move(str(path), str(target))
+            # Keep the detected language with the file
+            if sidecar_path(path).exists():
+                shutil.move(str(sidecar_path(path)), str(sidecar_path(target)))
+        except OSError as e:
+            self.log(f"Could not move {path.name}: {e}")
+            return
+        self.log(f"Moved {path.name} to {target_dir}")
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m watcher",
+        description="Watch directories and transcribe new audio/video files as they arrive."
+    )
+    parser.add_argument("directories", nargs="+", help="directories to watch")
+    parser.add_argument("--recursive", action="store_true", help="also watch subdirectories")
+    parser.add_argument("--settle-seconds", type=float, default=10,
+                        help="how long a file must stay unchanged before it is transcribed (default: 10)")
+    parser.add_argument("--poll-seconds", type=float, default=2, help="seconds between directory scans (default: 2)")
+    parser.add_argument("--mark", action="store_true",
+                        help="leave inputs in place with a .done/.failed marker instead of moving them "
+                             f"to {PROCESSED_DIR}/ or {FAILED_DIR}/")
+    parser.add_argument("--once", action="store_true", help="transcribe what is already there, then exit")
+    add_engine_arguments(parser)
+    return parser
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            print(f"Not a directory: {directory}", file=sys.stderr)
+            return 2
+
+    engine = engine_from_args(args)
+    watcher = FolderWatcher(args.directories, args.settle_seconds, args.recursive, args.mark)
+    # Load the model up front so the first file does not wait for it
+    engine.load_model()
+    print(f"Watching {', '.join(args.directories)}")
+
+    try:
+        while True:
+            ready = watcher.poll()
+            if ready:
+                failures = dict(engine.run(ready))
+                for input_file in ready:
+                    watcher.finish(input_file, input_file not in failures)
+            elif args.once and not watcher.pending:
+                return 0
+            time.sleep(args.poll_seconds)
+    except KeyboardInterrupt:
+        print("Stopped watching")
+        return 0
+    finally:
+        engine.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
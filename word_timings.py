@@ -0,0 +1,273 @@
+"""Compact binary word timings, written next to the subtitles.
+
+A ``<stem>.words`` file holds every aligned word with its real start, end
+and score, so viewers do not have to parse the SRT and guess word times.
+It is read through ``mmap`` without parsing, so even a multi-hour
+transcript opens instantly. Layout, all little-endian:
+
+- header: ``b"WXWT"``, version, word count, string count, string bytes, reserved (u32 each)
+- ``word_count`` u32 indices into the string table
+- ``word_count`` f32 start times, then end times, then scores (NaN if unknown)
+- ``string_count + 1`` u32 offsets into the string data, then the UTF-8 string data
+
+The columns are stored one after the other rather than as interleaved
+records, so each one can be used directly as a sorted array.
+``WordTimeline`` uses them to find the words spoken at a playback time.
+"""
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+MAGIC = b"WXWT"
+VERSION = 1
+HEADER = struct.Struct("<4sIIIII")
+
+SRT_SEGMENT = re.compile(r'(\d+)\n(\d{2}:\d{2}:\d{2},\d{3}) --> (\d{2}:\d{2}:\d{2},\d{3})\n(.*?)(?=\n\n|\Z)', re.DOTALL)
+SRT_WORD = re.compile(r'<font color="#ff0000">(.*?)</font>')
+
+
+def sidecar_path(output_dir, stem):
+    return Path(output_dir) / f"{stem}.words"
+
+
+def words_from_segments(segments):
+    """``(word, start, end, score)`` for every word of aligned ``segments``.
+
+    Words the aligner could not place get the end of the previous word.
+    """
+    words = []
+    for seg in segments:
+        previous_end = seg["start"]
+        for word in seg.get("words", ()):
+            start = _number(word.get("start"), previous_end)
+            end = _number(word.get("end"), start)
+            words.append((word["word"], start, end, _number(word.get("score"), math.nan)))
+            previous_end = end
+    return words
+
+
+def _number(value, default):
+    if value is None:
+        return default
+    value = float(value)
+    return default if math.isnan(value) else value
+
+
+def _to_le(values):
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_word_timings(path, words):
+    """Write ``(word, start, end, score)`` tuples to ``path``"""
+    strings = {}
+    indices = array("I")
+    starts, ends, scores = array("f"), array("f"), array("f")
+    for word, start, end, score in words:
+        indices.append(strings.setdefault(word, len(strings)))
+        starts.append(start)
+        ends.append(end)
+        scores.append(score)
+
+    offsets = array("I", [0])
+    data = bytearray()
+    for word in strings:
+        data += word.encode('utf-8')
+        offsets.append(len(data))
+
+    path = Path(path)
+    tmp_path = path.with_suffix(".words.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(indices), len(strings), len(data), 0))
+        for column in (indices, starts, ends, scores, offsets):
+            f.write(_to_le(column))
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+class WordTimings:
+    """Read-only, memory-mapped view of a ``.words`` file.
+
+    Indexing gives ``(word, start, end)`` tuples like ``parse_srt``;
+    ``starts``, ``ends`` and ``scores`` are the raw float columns.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, string_count, _, _ = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a word timings file")
+
+        view = memoryview(self._mmap)
+        offset = HEADER.size
+
+        def column(typecode, length):
+            nonlocal offset
+            size = 4 * length
+            chunk = view[offset:offset + size]
+            offset += size
+            if sys.byteorder == "little":
+                return chunk.cast(typecode)
+            # Big-endian hosts pay for a copy
+            values = array(typecode, chunk)
+            values.byteswap()
+            return values
+
+        self._indices = column("I", count)
+        self.starts = column("f", count)
+        self.ends = column("f", count)
+        self.scores = column("f", count)
+        self._offsets = column("I", string_count + 1)
+        self._data = view[offset:]
+        self._strings = [None] * string_count
+
+    def __len__(self):
+        return len(self._indices)
+
+    def word(self, index):
+        string_index = self._indices[index]
+        word = self._strings[string_index]
+        if word is None:
+            start, end = self._offsets[string_index], self._offsets[string_index + 1]
+            word = self._strings[string_index] = str(self._data[start:end], 'utf-8')
+        return word
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.word(index), self.starts[index], self.ends[index]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def close(self):
+        # The casts hold exports of the mmap, release them first
+        for name in ("_indices", "starts", "ends", "scores", "_offsets", "_data"):
+            value = getattr(self, name)
+            if isinstance(value, memoryview):
+                value.release()
+        self._mmap.close()
+
+
+class WordTimeline:
+    """Finds the words spoken at a playback time without scanning every word.
+
+    Start times are binary searched, and a running maximum of the end times
+    bounds the search from below, so a lookup only looks at the words around
+    the given time. While playback moves forward the searches resume from
+    the previous position.
+    """
+
+    def __init__(self, words):
+        if isinstance(words, WordTimings):
+            starts, ends = words.starts, words.ends
+        else:
+            starts = array("d", (start for _, start, _ in words))
+            ends = array("d", (end for _, _, end in words))
+
+        # Aligned words come in order, sort only if something is out of place
+        self._order = None
+        if any(starts[i] > starts[i + 1] for i in range(len(starts) - 1)):
+            self._order = sorted(range(len(starts)), key=starts.__getitem__)
+            starts = array("d", (starts[i] for i in self._order))
+            ends = array("d", (ends[i] for i in self._order))
+        self.starts = starts
+        self.ends = ends
+
+        # reach[i] is the latest end of words 0..i, never decreasing so it can be bisected too
+        self._reach = array("d")
+        latest = -math.inf
+        for end in ends:
+            latest = max(latest, end)
+            self._reach.append(latest)
+
+        self._time = -math.inf
+        self._lo = 0
+        self._hi = 0
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def end(self):
+        """End time of the last word to finish"""
+        return self._reach[-1] if self._reach else 0.0
+
+    def _seek(self, time):
+        # Resume from the last position unless playback went backwards
+        if time < self._time:
+            self._lo = self._hi = 0
+        self._time = time
+        # Words before lo all ended before time, words from hi on start after it
+        self._lo = bisect_left(self._reach, time, self._lo)
+        self._hi = bisect_right(self.starts, time, self._hi)
+
+    def _word(self, position):
+        return self._order[position] if self._order else position
+
+    def active(self, time):
+        """Indices of the words with ``start <= time <= end``"""
+        self._seek(time)
+        return [self._word(i) for i in range(self._lo, self._hi) if self.ends[i] >= time]
+
+    def current(self, time):
+        """Index of the first word spoken at ``time``, else of the last word started before it.
+
+        None if no word has started yet.
+        """
+        active = self.active(time)
+        if active:
+            return min(active)
+        return self._word(self._hi - 1) if self._hi else None
+
+
+def timestamp_to_seconds(timestamp):
+    h, m, rest = timestamp.split(':')
+    s, ms = rest.split(',')
+    return int(h) * 3600 + int(m) * 60 + int(s) + int(ms) / 1000
+
+
+def parse_srt(srt_file):
+    """``(word, start, end)`` from the highlighted words of an SRT file.
+
+    SRT has no per-word times, so each segment's duration is spread evenly
+    over its words. Only used when there is no ``.words`` file.
+    """
+    with open(srt_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    words = []
+    for _, start_time, end_time, text in SRT_SEGMENT.findall(content):
+        word_matches = SRT_WORD.findall(text)
+        if word_matches:
+            start_seconds = timestamp_to_seconds(start_time)
+            end_seconds = timestamp_to_seconds(end_time)
+            word_duration = (end_seconds - start_seconds) / len(word_matches)
+            for i, word in enumerate(word_matches):
+                word_start = start_seconds + (i * word_duration)
+                words.append((word, word_start, word_start + word_duration))
+    return words
+
+
+def load_words(srt_file):
+    """Word timings for ``srt_file``, from its ``.words`` sidecar if there is one"""
+    path = sidecar_path(os.path.dirname(srt_file), Path(srt_file).stem)
+    if path.exists():
+        try:
+            return WordTimings(path)
+        except (OSError, ValueError):
+            pass
+    return parse_srt(srt_file)
@@ -0,0 +1,204 @@
+"""Multi-process worker pool for CPU transcription.
+
+Each worker process keeps its own resident Whisper model and gets a fixed
+intra-op thread budget, so N workers share the cores of a large CPU host
+instead of one ctranslate2 instance trying to use all of them. Every file
+runs through the same engine stages as the serial path.
+
+With a memory budget, a worker whose resident memory has grown past it
+finishes its current file and exits, and a fresh worker takes its place.
+Freeing models inside a process rarely gives the memory back, replacing
+the process always does.
+
+Every worker talks to the parent over a pipe of its own, so a worker that
+is killed mid-message cannot block the others.
+"""
+import collections
+import multiprocessing
+import os
+import threading
+import time
+from multiprocessing.connection import wait
+from pathlib import Path
+
+from telemetry import Telemetry, resident_mb
+
+
+def default_worker_count(threads_per_worker):
+    return max(1, (os.cpu_count() or 1) // max(1, threads_per_worker))
+
+
+def _init_worker(engine_kwargs, threads, log, telemetry):
+    # OpenMP/BLAS read these when they are first initialised; torch and the
+    # model get the same budget explicitly below in case they already are
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[name] = str(threads)
+
+    import torch
+    from engine import TranscriptionEngine
+
+    torch.set_num_threads(threads)
+    engine = TranscriptionEngine(**engine_kwargs, cpu_threads=threads, pipelined=False, log=log, telemetry=telemetry)
+    # Load the model once so it stays resident for every file of this worker
+    engine.load_model()
+    return engine
+
+
+def _worker_main(engine_kwargs, threads, memory_limit_mb, forward_events, conn):
+    pid = os.getpid()
+    # Stage threads, e.g. diarization, log too
+    send_lock = threading.Lock()
+
+    def send(*message):
+        with send_lock:
+            conn.send(message)
+
+    def log(message):
+        send("log", f"[worker {pid}] {message.strip()}")
+
+    # Telemetry events go to the parent's sinks
+    telemetry = Telemetry([lambda record: send("event", record)]) if forward_events else None
+    engine = _init_worker(engine_kwargs, threads, log, telemetry)
+
+    if memory_limit_mb:
+        loaded_mb = resident_mb()
+        if loaded_mb is None:
+            log("Cannot read resident memory on this platform, --worker-memory-mb is ignored")
+            memory_limit_mb = None
+        elif loaded_mb >= memory_limit_mb:
+            # Recycling would only load the model again and exceed it straight away
+            log(f"The loaded model already uses {loaded_mb:.0f} MB, more than the "
+                f"{memory_limit_mb:.0f} MB budget; --worker-memory-mb is ignored")
+            memory_limit_mb = None
+
+    while True:
+        try:
+            input_file = conn.recv()
+        except EOFError:
+            return
+        if input_file is None:
+            return
+        try:
+            output_dir, error = str(engine.process_file(input_file)), None
+        except Exception as e:
+            # Exceptions from native libraries do not always pickle
+            output_dir, error = None, f"{type(e).__name__}: {e}"
+
+        rss = resident_mb() if memory_limit_mb else None
+        retire = rss is not None and rss > memory_limit_mb
+        if retire:
+            log(f"Using {rss:.0f} MB, over the {memory_limit_mb:.0f} MB budget, restarting worker")
+        send("result", input_file, output_dir, error, retire)
+        if retire:
+            return
+
+
+class _Worker:
+    def __init__(self, ctx, args):
+        self.conn, child_conn = ctx.Pipe()
+        self.input_file = None
+        self.retiring = False
+        self.process = ctx.Process(target=_worker_main, args=(*args, child_conn), daemon=True)
+        self.process.start()
+        # Only the worker holds its end now, so its exit reads as EOF here
+        child_conn.close()
+
+
+def run_pool(files, engine_kwargs, workers=None, threads_per_worker=4, memory_limit_mb=None,
+             log=print, on_file_done=None, on_event=None):
+    """Transcribe ``files`` in a pool of worker processes.
+
+    ``engine_kwargs`` are passed to ``TranscriptionEngine`` in each worker.
+    ``memory_limit_mb`` is a resident memory budget per worker, checked
+    between files; a worker over it is replaced by a fresh one. Telemetry
+    events of the workers are passed to ``on_event(record)``. Returns
+    ``(input_file, error)`` tuples for the files that failed, like
+    ``TranscriptionEngine.run``.
+    """
+    workers = workers or default_worker_count(threads_per_worker)
+    workers = min(workers, len(files))
+    log(f"Starting {workers} CPU workers with {threads_per_worker} threads each")
+
+    # spawn gives every worker a fresh interpreter instead of a fork of a
+    # process that may already hold a model and running threads
+    ctx = multiprocessing.get_context("spawn")
+    args = (engine_kwargs, threads_per_worker, memory_limit_mb, on_event is not None)
+    pending = collections.deque(files)
+    failures = []
+
+    def finish(input_file, output_dir, error):
+        if error:
+            log(f"Error during transcription of {input_file}: {error}")
+            failures.append((input_file, RuntimeError(error)))
+            return
+        log(f"Transcription complete for: {input_file}")
+        log(f"Files saved in: {output_dir}")
+        if on_file_done:
+            on_file_done(input_file, Path(output_dir))
+
+    def receive(worker):
+        """Handle everything ``worker`` has sent, False once it has exited"""
+        try:
+            while worker.conn.poll():
+                kind, *message = worker.conn.recv()
+                if kind == "log":
+                    log(message[0])
+                elif kind == "event":
+                    on_event(message[0])
+                else:
+                    input_file, output_dir, error, worker.retiring = message
+                    worker.input_file = None
+                    finish(input_file, output_dir, error)
+        except (EOFError, OSError):
+            return False
+        return True
+
+    def lost(worker):
+        worker.process.join()
+        worker.conn.close()
+        if not worker.input_file:
+            return
+        # The worker itself died, e.g. it was killed for running out of memory
+        error = f"worker failed with exit code {worker.process.exitcode}"
+        if on_event:
+            # The worker could not report the end of this file itself
+            on_event({"event": "file_end", "ts": time.time(), "file": str(worker.input_file),
+                      "status": "error", "failed_stage": None, "error": error, "duration": None,
+                      "audio_seconds": None, "segments": None, "output_dir": None})
+        finish(worker.input_file, None, error)
+
+    pool = [_Worker(ctx, args) for _ in range(workers)]
+    try:
+        while pending or any(worker.input_file for worker in pool):
+            # A worker that fails to start loses the file it was given and is
+            # replaced below, so a broken setup still ends the batch
+            for worker in pool:
+                if worker.input_file is None and pending and not worker.retiring:
+                    worker.input_file = pending.popleft()
+                    try:
+                        worker.conn.send(worker.input_file)
+                    except OSError:
+                        # Already gone, reported as lost below
+                        pass
+
+            ready = wait([worker.conn for worker in pool], timeout=0.2)
+            for worker in [worker for worker in pool if worker.conn in ready]:
+                if receive(worker):
+                    continue
+                lost(worker)
+                pool.remove(worker)
+                if pending:
+                    pool.append(_Worker(ctx, args))
+    finally:
+        for worker in pool:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+        for worker in pool:
+            # Pass on anything sent while shutting down, until the worker exits
+            while receive(worker):
+                wait([worker.conn], timeout=0.2)
+            worker.process.join()
+            worker.conn.close()
+    return failures